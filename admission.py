@@ -0,0 +1,160 @@
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+# Настройки допуска запросов (на один процесс gunicorn):
+#   ADMISSION_CAPACITY       - сколько callback'ов может считаться одновременно
+#                              (обычно равно числу потоков воркера)
+#   ADMISSION_RESERVED       - сколько из них оставлено только для дешёвых панелей
+#   ADMISSION_CALLBACK_LIMIT - лимит одновременных расчётов одной тяжёлой панели
+#   ADMISSION_QUEUE_SIZE     - сколько запросов одной панели может ждать в очереди
+#   ADMISSION_TIMEOUT        - сколько секунд запрос ждёт в очереди
+ADMISSION_CAPACITY = int(os.environ.get("ADMISSION_CAPACITY", "8"))
+ADMISSION_RESERVED = int(os.environ.get("ADMISSION_RESERVED", "2"))
+ADMISSION_CALLBACK_LIMIT = int(os.environ.get("ADMISSION_CALLBACK_LIMIT", "2"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "8"))
+ADMISSION_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", "10"))
+
+# Приоритеты: дешёвые панели (карточки, тренд) обслуживаются раньше тяжёлых
+HIGH_PRIORITY = 0
+LOW_PRIORITY = 1
+
+
+# Допуск callback'ов к расчёту: общий лимит, лимит на панель и очередь
+# ожидания с приоритетами и таймаутом
+class AdmissionController:
+    def __init__(self, capacity, reserved):
+        self.capacity = capacity
+        self.reserved = reserved
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._policies = {}
+        self._waiting = []  # (приоритет, порядковый номер, имя)
+        self._active = 0
+        self._active_by_name = Counter()
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self.timed_out = Counter()
+
+    def register(self, name, priority, limit, queue_size, timeout):
+        self._policies[name] = (priority, limit, queue_size, timeout)
+
+    # Может ли панель начать расчёт прямо сейчас
+    def _can_run(self, name):
+        priority, limit, _, _ = self._policies[name]
+        if self._active_by_name[name] >= limit:
+            return False
+        # Тяжёлым панелям недоступны зарезервированные места
+        slots = self.capacity if priority == HIGH_PRIORITY else self.capacity - self.reserved
+        return self._active < slots
+
+    # Первый в порядке приоритета ожидающий, который может начать расчёт
+    def _next_runnable(self):
+        for entry in sorted(self._waiting):
+            if self._can_run(entry[2]):
+                return entry
+        return None
+
+    def _start(self, name):
+        self._active += 1
+        self._active_by_name[name] += 1
+        self.admitted[name] += 1
+
+    # Возвращает False, если очередь переполнена или время ожидания истекло
+    def acquire(self, name):
+        priority, _, queue_size, timeout = self._policies[name]
+        with self._cond:
+            if not self._waiting and self._can_run(name):
+                self._start(name)
+                return True
+
+            if sum(1 for entry in self._waiting if entry[2] == name) >= queue_size:
+                self.rejected[name] += 1
+                return False
+
+            entry = (priority, next(self._sequence), name)
+            self._waiting.append(entry)
+            deadline = time.monotonic() + timeout
+            while self._next_runnable() is not entry:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Место освободилось, но очередь ещё не дошла до нас
+                    # (впереди ожидающий, который не успел проснуться) -
+                    # занимаем его, а не отказываем при свободном месте
+                    if self._can_run(name):
+                        break
+                    self._waiting.remove(entry)
+                    self.timed_out[name] += 1
+                    # Наш уход мог освободить очередь для других
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+            self._waiting.remove(entry)
+            self._start(name)
+            # Очередь сдвинулась: следующий ожидающий мог стать первым, и
+            # без оповещения он проспит до таймаута при свободных местах
+            self._cond.notify_all()
+            return True
+
+    def release(self, name):
+        with self._cond:
+            self._active -= 1
+            self._active_by_name[name] -= 1
+            self._cond.notify_all()
+
+    # Метрики в текстовом формате Prometheus
+    def metrics_lines(self):
+        with self._cond:
+            names = sorted(self._policies)
+            waiting = Counter(entry[2] for entry in self._waiting)
+            active = dict(self._active_by_name)
+            counters = {
+                'admitted': dict(self.admitted),
+                'rejected': dict(self.rejected),
+                'timed_out': dict(self.timed_out),
+            }
+
+        lines = [
+            "# HELP dash_admission_queue_depth Requests waiting for a callback slot",
+            "# TYPE dash_admission_queue_depth gauge",
+        ]
+        lines += [f'dash_admission_queue_depth{{callback="{name}"}} {waiting.get(name, 0)}' for name in names]
+        lines += [
+            "# HELP dash_admission_active Callbacks currently computing",
+            "# TYPE dash_admission_active gauge",
+        ]
+        lines += [f'dash_admission_active{{callback="{name}"}} {active.get(name, 0)}' for name in names]
+        for counter, values in counters.items():
+            lines += [
+                f"# HELP dash_admission_{counter}_total Requests {counter.replace('_', ' ')} by admission control",
+                f"# TYPE dash_admission_{counter}_total counter",
+            ]
+            lines += [f'dash_admission_{counter}_total{{callback="{name}"}} {values.get(name, 0)}' for name in names]
+        return lines
+
+
+admission = AdmissionController(ADMISSION_CAPACITY, ADMISSION_RESERVED)
+
+
+# Декоратор для callback'а. Если места не нашлось, вместо ожидания до
+# таймаута воркера возвращается облегчённый ответ busy_response()
+def admission_controlled(name, busy_response, priority=LOW_PRIORITY, limit=None):
+    if limit is None:
+        limit = ADMISSION_CAPACITY if priority == HIGH_PRIORITY else ADMISSION_CALLBACK_LIMIT
+    admission.register(name, priority, limit, ADMISSION_QUEUE_SIZE, ADMISSION_TIMEOUT)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            if not admission.acquire(name):
+                return busy_response()
+            try:
+                return func(*args)
+            finally:
+                admission.release(name)
+        return wrapper
+    return decorator
@@ -1,27 +1,40 @@
 import dash
 from dash import dcc, html, Input, Output
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import timedelta
+from functools import wraps
 import numpy as np
+import os
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
 import dash_core_components as dcc
 import dash_html_components as html
 
-# Загрузка данных с обработкой ошибок
-try:
-    # Указываем формат даты явно
-    df_main = pd.read_csv("data/Main_Table_Clinics.csv")
-    df_main['Date'] = pd.to_datetime(df_main['Date'], format='%m/%d/%y')
-    df_doctors_adult = pd.read_csv("data/Doctor_in_Adult_check-ups_daily.csv")
-    df_doctors_kids = pd.read_csv("data/Doctor_in_kids_check-ups_daily.csv")
-except Exception as e:
-    print(f"Ошибка при загрузке данных: {e}")
-    df_main = pd.DataFrame(columns=["Date", "Day_of_the_week", "Number_of_the_week", "Name_of_clinic", "Count_of_chekups"])
-    df_doctors_adult = pd.DataFrame()
-    df_doctors_kids = pd.DataFrame()
+from dash import Patch, no_update
+from dash.exceptions import PreventUpdate
+from flask import Response
+
+from admission import HIGH_PRIORITY, admission, admission_controlled
+from data_store import get_snapshot, refresh_if_changed, to_day
+from figures import (
+    comparison_figure, doctors_figure, empty_figure, heatmap_figure,
+    iso_dates, message_figure, radar_figure, trend_figure
+)
+from prerender import serve_prerendered
+from profiling import profiled
+from singleflight import flights, single_flight
+
+# Количество врачей на одной странице графика
+DOCTORS_PAGE_SIZE = 15
+
+# Период опроса версии данных в режиме живого обновления, секунд
+LIVE_POLL_INTERVAL = int(os.environ.get("LIVE_POLL_INTERVAL", "60"))
+
+# Максимальное количество периодов в сравнении
+MAX_COMPARISON_PERIODS = 12
+
+# Названия дней недели (индекс 0 = понедельник)
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
 # Создаём Dash-приложение с темой Bootstrap и пользовательскими ресурсами
 app = dash.Dash(
@@ -33,110 +46,173 @@ app = dash.Dash(
 )
 server = app.server
 
-# 📌 Общие фильтры для всех дашбордов
-filters = html.Div([
-    html.Div([
-        # Фильтр клиник
+# Метрики сервера в текстовом формате Prometheus
+@server.route('/metrics')
+def metrics():
+    lines = flights.metrics_lines() + admission.metrics_lines()
+    return Response("\n".join(lines) + "\n", mimetype='text/plain')
+
+# 📌 Общие фильтры для всех дашбордов (границы дат и клиники берутся из
+# текущего снимка данных, чтобы новая вкладка видела последнюю загрузку)
+def make_filters(snapshot):
+    return html.Div([
         html.Div([
+            # Фильтр клиник
             html.Div([
-                html.H4("Выбор клиники", className='text-xl font-semibold text-gray-800')
-            ], className='h-8 flex items-center'),
-            html.Div([
-                dcc.Dropdown(
-                    id='clinic-filter',
-                    options=[{"label": c, "value": c} for c in df_main["Name_of_clinic"].unique()],
-                    value=list(df_main["Name_of_clinic"].unique()),
-                    multi=True,
-                    clearable=False,
-                    className='w-72'
-                )
-            ], className='h-10 flex items-center')
-        ], className='flex flex-col justify-between'),
+                html.Div([
+                    html.H4("Выбор клиники", className='text-xl font-semibold text-gray-800')
+                ], className='h-8 flex items-center'),
+                html.Div([
+                    dcc.Dropdown(
+                        id='clinic-filter',
+                        options=[{"label": c, "value": c} for c in snapshot.clinics],
+                        value=list(snapshot.clinics),
+                        multi=True,
+                        clearable=False,
+                        className='w-72'
+                    )
+                ], className='h-10 flex items-center')
+            ], className='flex flex-col justify-between'),
         
-        # Фильтр дат
-        html.Div([
+            # Фильтр дат
             html.Div([
-                html.H4("Выберите период", className='text-xl font-semibold text-gray-800')
-            ], className='h-8 flex items-center'),
+                html.Div([
+                    html.H4("Выберите период", className='text-xl font-semibold text-gray-800')
+                ], className='h-8 flex items-center'),
+                html.Div([
+                    dcc.DatePickerRange(
+                        id='date-filter',
+                        start_date=snapshot.min_date,
+                        end_date=snapshot.max_date,
+                        min_date_allowed=snapshot.min_date,
+                        max_date_allowed=snapshot.max_date,
+                        initial_visible_month=snapshot.max_date,
+                        first_day_of_week=1,
+                        display_format='DD.MM.YYYY',
+                        month_format='MMMM YYYY',
+                        start_date_placeholder_text='От',
+                        end_date_placeholder_text='До',
+                        calendar_orientation='horizontal',
+                        day_size=45,
+                        with_portal=True,
+                        clearable=False,
+                        number_of_months_shown=2,
+                        persistence=True,
+                        persisted_props=['start_date', 'end_date'],
+                        updatemode='bothdates',
+                        style={'font-family': 'Arial', 'z-index': '100'}
+                    )
+                ], className='h-10 flex items-center')
+            ], className='flex flex-col justify-between'),
+        
+            # Живое обновление (для экранов, где дашборд открыт весь день)
             html.Div([
-                dcc.DatePickerRange(
-                    id='date-filter',
-                    start_date=df_main["Date"].min(),
-                    end_date=df_main["Date"].max(),
-                    min_date_allowed=df_main["Date"].min(),
-                    max_date_allowed=df_main["Date"].max(),
-                    initial_visible_month=df_main["Date"].max(),
-                    first_day_of_week=1,
-                    display_format='DD.MM.YYYY',
-                    month_format='MMMM YYYY',
-                    start_date_placeholder_text='От',
-                    end_date_placeholder_text='До',
-                    calendar_orientation='horizontal',
-                    day_size=45,
-                    with_portal=True,
-                    clearable=False,
-                    number_of_months_shown=2,
-                    persistence=True,
-                    persisted_props=['start_date', 'end_date'],
-                    updatemode='bothdates',
-                    style={'font-family': 'Arial', 'z-index': '100'}
-                )
-            ], className='h-10 flex items-center')
-        ], className='flex flex-col justify-between')
-    ], className='flex justify-center gap-8')
-], className='m-5 mb-8')
-
-# Интерфейс дашборда
-app.layout = html.Div([
-    html.H1("Аналитика медицинских чек-апов", className='text-3xl font-bold text-center my-6 text-gray-800'),
-    filters,
+                html.Div([
+                    html.H4("Обновление", className='text-xl font-semibold text-gray-800')
+                ], className='h-8 flex items-center'),
+                html.Div([
+                    dcc.Checklist(
+                        id='live-mode',
+                        options=[{"label": " Живое обновление", "value": "on"}],
+                        value=[],
+                        persistence=True
+                    ),
+                    dcc.Interval(id='live-interval', interval=LIVE_POLL_INTERVAL * 1000, disabled=True),
+                    dcc.Store(id='live-data', data={
+                        'fingerprint': snapshot.fingerprint,
+                        'max_date': snapshot.max_date.date().isoformat() if snapshot.max_date is not None else None,
+                        'previous_max_date': None
+                    }),
+                    dcc.Store(id='live-view')
+                ], className='h-10 flex items-center')
+            ], className='flex flex-col justify-between')
+        ], className='flex justify-center gap-8')
+    ], className='m-5 mb-8')
+
+# Интерфейс дашборда: собирается заново при каждой загрузке страницы
+def serve_layout():
+    return html.Div([
+        html.H1("Аналитика медицинских чек-апов", className='text-3xl font-bold text-center my-6 text-gray-800'),
+        make_filters(refresh_if_changed()),
     
-    # Первый ряд дашбордов
-    html.Div([
-        # Дашборд 1: Общая статистика
+        # Первый ряд дашбордов
         html.Div([
-            html.H3("Общая статистика", className='text-2xl font-semibold text-center mb-6'),
-            html.Div(id='total-stats')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
+            # Дашборд 1: Общая статистика
+            html.Div([
+                html.H3("Общая статистика", className='text-2xl font-semibold text-center mb-6'),
+                html.Div(id='total-stats')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
         
-        # Дашборд 2: График тренда
-        html.Div([
-            html.H3("Тренд чек-апов", className='text-2xl font-semibold text-center mb-6'),
-            dcc.Graph(id='trend-graph')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
-    ], className='flex mx-5 my-6'),
+            # Дашборд 2: График тренда
+            html.Div([
+                html.H3("Тренд чек-апов", className='text-2xl font-semibold text-center mb-6'),
+                dcc.Graph(id='trend-graph')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
+        ], className='flex mx-5 my-6'),
     
-    # Второй ряд дашбордов
-    html.Div([
-        # Дашборд 3: Тепловая карта
+        # Второй ряд дашбордов
         html.Div([
-            html.H3("Тепловая карта загруженности", className='text-2xl font-semibold text-center mb-2'),
-            dcc.Graph(id='heatmap')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
+            # Дашборд 3: Тепловая карта
+            html.Div([
+                html.H3("Тепловая карта загруженности", className='text-2xl font-semibold text-center mb-2'),
+                dcc.Graph(id='heatmap')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
         
-        # Дашборд 4: Статистика по врачам
-        html.Div([
-            html.H3("Статистика по врачам", className='text-xl font-semibold text-center mb-1'),
-            html.H4("Количество выполненых чек-апов по врачам", className='text-lg font-medium text-center mb-4'),
-            dcc.Graph(id='doctors-stats')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
-    ], className='flex mx-5 my-6'),
+            # Дашборд 4: Статистика по врачам
+            html.Div([
+                html.H3("Статистика по врачам", className='text-xl font-semibold text-center mb-1'),
+                html.H4("Количество выполненых чек-апов по врачам", className='text-lg font-medium text-center mb-4'),
+                dcc.Graph(id='doctors-stats'),
+                # Постраничный просмотр рейтинга врачей
+                html.Div([
+                    html.Button("← Назад", id='doctors-prev', n_clicks=0,
+                                className='px-4 py-1 rounded border border-gray-300 bg-white'),
+                    html.Span(id='doctors-page-info', className='text-sm text-gray-600'),
+                    html.Button("Далее →", id='doctors-next', n_clicks=0,
+                                className='px-4 py-1 rounded border border-gray-300 bg-white'),
+                    dcc.Store(id='doctors-page', data=0)
+                ], className='flex justify-center items-center gap-4 mt-2')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
+        ], className='flex mx-5 my-6'),
     
-    # Третий ряд дашбордов
-    html.Div([
-        # Дашборд 5: Сравнение периодов
-        html.Div([
-            html.H3("Сравнение периодов", className='text-xl font-semibold text-center mb-4'),
-            dcc.Graph(id='period-comparison')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
-        
-        # Дашборд 6: Дополнительная аналитика
+        # Третий ряд дашбордов
         html.Div([
-            html.H3("Дополнительная аналитика", className='text-xl font-semibold text-center mb-4'),
-            dcc.Graph(id='additional-analytics')
-        ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
-    ], className='flex mx-5 my-6')
-], className='min-h-screen bg-gray-50')
+            # Дашборд 5: Сравнение периодов
+            html.Div([
+                html.H3("Сравнение периодов", className='text-xl font-semibold text-center mb-4'),
+                # Параметры сравнения: тип периода, их количество и длина в днях
+                html.Div([
+                    dcc.Dropdown(
+                        id='comparison-unit',
+                        options=[
+                            {"label": "Недели", "value": "week"},
+                            {"label": "Месяцы", "value": "month"},
+                            {"label": "Дни", "value": "days"}
+                        ],
+                        value='week',
+                        clearable=False,
+                        className='w-40'
+                    ),
+                    html.Span("Периодов:", className='text-sm text-gray-600'),
+                    dcc.Input(id='comparison-count', type='number', min=1, max=MAX_COMPARISON_PERIODS,
+                              step=1, value=2, className='w-16 border border-gray-300 rounded px-2'),
+                    html.Span("Длина, дней:", className='text-sm text-gray-600'),
+                    dcc.Input(id='comparison-length', type='number', min=1, step=1, value=7,
+                              className='w-16 border border-gray-300 rounded px-2')
+                ], className='flex justify-center items-center gap-3 mb-2'),
+                dcc.Graph(id='period-comparison')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg'),
+        
+            # Дашборд 6: Дополнительная аналитика
+            html.Div([
+                html.H3("Дополнительная аналитика", className='text-xl font-semibold text-center mb-4'),
+                dcc.Graph(id='additional-analytics')
+            ], className='w-1/2 p-6 m-2 bg-white rounded-lg shadow-lg')
+        ], className='flex mx-5 my-6')
+    ], className='min-h-screen bg-gray-50')
+
+
+app.layout = serve_layout
 
 # Функция для получения номера недели
 def get_week_number(date):
@@ -169,65 +245,116 @@ def calculate_percentage_change(current, previous):
 def format_number(number):
     return f"{number:,}".replace(",", " ")
 
+# Облегчённые ответы, когда сервер перегружен и панель не допущена к расчёту
+def busy_figure():
+    return message_figure("Сервер занят, панель обновится при следующем изменении фильтров")
+
+def busy_stats():
+    return html.Div("Сервер занят, попробуйте обновить страницу позже",
+                    className='text-center text-gray-500')
+
+def busy_doctors_stats():
+    return busy_figure(), no_update, no_update, no_update
+
+# Для панелей, которые живое обновление дополняет изменениями. Вслед за
+# изменениями оно сдвигает конец периода в фильтре, и этот сдвиг снова
+# запускает панели - пересчитывать их не нужно, они уже показаны до новой даты.
+# Остальные панели по сдвигу пересчитываются как обычно.
+def skip_live_end_date(func):
+    @wraps(func)
+    def wrapper(selected_clinics, start_date, end_date, live_view=None):
+        if (live_view and live_view['shown_end'] == str(to_day(end_date))
+                and dash.callback_context.triggered_prop_ids == {'date-filter.end_date': 'date-filter'}):
+            raise PreventUpdate
+        return func(selected_clinics, start_date, end_date)
+    return wrapper
+
+# Цвет процента изменения
+def change_color(change):
+    return 'text-green-500' if change > 0 else 'text-red-500'
+
+# Значения карточек общей статистики
+def compute_total_stats(snapshot, selected_clinics, start_date, end_date):
+    # Преобразуем даты
+    end_date = pd.to_datetime(end_date).date()
+    
+    # Получаем даты для текущей недели (с понедельника по выбранную дату)
+    current_week_start, _ = get_week_dates(end_date)
+    
+    # Получаем даты для прошлой недели
+    last_week_start = current_week_start - timedelta(days=7)
+    last_week_end = current_week_start - timedelta(days=1)
+    
+    # Получаем даты для позапрошлой недели
+    prev_week_start = last_week_start - timedelta(days=7)
+    prev_week_end = last_week_start - timedelta(days=1)
+    
+    # Фильтруем данные
+    clinic_mask = snapshot.main_mask(selected_clinics)
+    
+    # Получаем количество чек-апов за текущую неделю (с понедельника по выбранную дату)
+    current_week_checkups = snapshot.counts[
+        clinic_mask &
+        (snapshot.dates >= to_day(current_week_start)) &
+        (snapshot.dates <= to_day(end_date))
+    ].sum()
+    
+    # Получаем количество чек-апов за прошлую неделю
+    last_week_checkups = snapshot.counts[
+        clinic_mask &
+        (snapshot.dates >= to_day(last_week_start)) &
+        (snapshot.dates <= to_day(last_week_end))
+    ].sum()
+    
+    # Получаем количество чек-апов за позапрошлую неделю
+    prev_week_checkups = snapshot.counts[
+        clinic_mask &
+        (snapshot.dates >= to_day(prev_week_start)) &
+        (snapshot.dates <= to_day(prev_week_end))
+    ].sum()
+    
+    # Рассчитываем процент изменения
+    percentage_change = calculate_percentage_change(last_week_checkups, prev_week_checkups)
+    
+    # Получаем общее количество чек-апов за выбранный период
+    total_checkups = snapshot.counts[
+        clinic_mask &
+        (snapshot.dates >= to_day(start_date)) &
+        (snapshot.dates <= to_day(end_date))
+    ].sum()
+    
+    return {
+        'current_week': current_week_checkups,
+        'last_week': last_week_checkups,
+        'change': percentage_change,
+        'total': total_checkups
+    }
+
 # Обновленный callback для общей статистики
 @app.callback(
     Output('total-stats', 'children'),
     [Input('clinic-filter', 'value'),
      Input('date-filter', 'start_date'),
-     Input('date-filter', 'end_date')]
+     Input('date-filter', 'end_date')],
+    [State('live-view', 'data')]
 )
+@skip_live_end_date
+@serve_prerendered('total-stats')
+@single_flight('total-stats')
+@admission_controlled('total-stats', busy_stats, priority=HIGH_PRIORITY)
+@profiled('total-stats')
 def update_total_stats(selected_clinics, start_date, end_date):
     try:
-        # Преобразуем даты
-        end_date = pd.to_datetime(end_date).date()
-        
-        # Получаем даты для текущей недели (с понедельника по выбранную дату)
-        current_week_start, _ = get_week_dates(end_date)
-        
-        # Получаем даты для прошлой недели
-        last_week_start = current_week_start - timedelta(days=7)
-        last_week_end = current_week_start - timedelta(days=1)
-        
-        # Получаем даты для позапрошлой недели
-        prev_week_start = last_week_start - timedelta(days=7)
-        prev_week_end = last_week_start - timedelta(days=1)
-        
-        # Фильтруем данные
-        df_filtered = df_main[df_main["Name_of_clinic"].isin(selected_clinics)]
-        
-        # Получаем количество чек-апов за текущую неделю (с понедельника по выбранную дату)
-        current_week_checkups = df_filtered[
-            (df_filtered["Date"].dt.date >= current_week_start) & 
-            (df_filtered["Date"].dt.date <= end_date)
-        ]["Count_of_chekups"].sum()
-        
-        # Получаем количество чек-апов за прошлую неделю
-        last_week_checkups = df_filtered[
-            (df_filtered["Date"].dt.date >= last_week_start) & 
-            (df_filtered["Date"].dt.date <= last_week_end)
-        ]["Count_of_chekups"].sum()
-        
-        # Получаем количество чек-апов за позапрошлую неделю
-        prev_week_checkups = df_filtered[
-            (df_filtered["Date"].dt.date >= prev_week_start) & 
-            (df_filtered["Date"].dt.date <= prev_week_end)
-        ]["Count_of_chekups"].sum()
-        
-        # Рассчитываем процент изменения
-        percentage_change = calculate_percentage_change(last_week_checkups, prev_week_checkups)
-        
-        # Получаем общее количество чек-апов за выбранный период
-        total_checkups = df_filtered[
-            (df_filtered["Date"].dt.date >= pd.to_datetime(start_date).date()) & 
-            (df_filtered["Date"].dt.date <= end_date)
-        ]["Count_of_chekups"].sum()
+        snapshot = get_snapshot()
+
+        stats = compute_total_stats(snapshot, selected_clinics, start_date, end_date)
         
         return html.Div([
             # Карточка текущей недели
             html.Div([
                 html.Div([
                     html.H4("Текущая неделя", className='text-lg font-medium text-gray-600 mb-auto'),
-                    html.H2(format_number(current_week_checkups), className='text-3xl font-bold text-gray-800')
+                    html.H2(format_number(stats['current_week']), className='text-3xl font-bold text-gray-800')
                 ], className='flex flex-col justify-between h-full min-h-[100px]')
             ], className='bg-white rounded-lg shadow-md p-6'),
             
@@ -235,7 +362,7 @@ def update_total_stats(selected_clinics, start_date, end_date):
             html.Div([
                 html.Div([
                     html.H4("Прошлая неделя", className='text-lg font-medium text-gray-600 mb-auto'),
-                    html.H2(format_number(last_week_checkups), className='text-3xl font-bold text-gray-800')
+                    html.H2(format_number(stats['last_week']), className='text-3xl font-bold text-gray-800')
                 ], className='flex flex-col justify-between h-full min-h-[100px]')
             ], className='bg-white rounded-lg shadow-md p-6'),
             
@@ -244,8 +371,8 @@ def update_total_stats(selected_clinics, start_date, end_date):
                 html.Div([
                     html.H4("Изменение", className='text-lg font-medium text-gray-600 mb-auto'),
                     html.H2(
-                        f"{percentage_change:.2f}%",
-                        className=f"text-3xl font-bold {'text-green-500' if percentage_change > 0 else 'text-red-500'}"
+                        f"{stats['change']:.2f}%",
+                        className=f"text-3xl font-bold {change_color(stats['change'])}"
                     )
                 ], className='flex flex-col justify-between h-full min-h-[100px]')
             ], className='bg-white rounded-lg shadow-md p-6'),
@@ -254,7 +381,7 @@ def update_total_stats(selected_clinics, start_date, end_date):
             html.Div([
                 html.Div([
                     html.H4("Всего за период", className='text-lg font-medium text-gray-600 mb-auto'),
-                    html.H2(format_number(total_checkups), className='text-3xl font-bold text-gray-800')
+                    html.H2(format_number(stats['total']), className='text-3xl font-bold text-gray-800')
                 ], className='flex flex-col justify-between h-full min-h-[100px]')
             ], className='bg-white rounded-lg shadow-md p-6')
             
@@ -268,15 +395,18 @@ def update_total_stats(selected_clinics, start_date, end_date):
     Output('trend-graph', 'figure'),
     [Input('clinic-filter', 'value'),
      Input('date-filter', 'start_date'),
-     Input('date-filter', 'end_date')]
+     Input('date-filter', 'end_date')],
+    [State('live-view', 'data')]
 )
+@skip_live_end_date
+@serve_prerendered('trend-graph')
+@single_flight('trend-graph')
+@admission_controlled('trend-graph', busy_figure, priority=HIGH_PRIORITY)
+@profiled('trend-graph')
 def update_trend(selected_clinics, start_date, end_date):
     try:
-        df_filtered = df_main[
-            (df_main["Name_of_clinic"].isin(selected_clinics)) &
-            (df_main["Date"] >= pd.to_datetime(start_date)) &
-            (df_main["Date"] <= pd.to_datetime(end_date))
-        ]
+        snapshot = get_snapshot()
+        mask = snapshot.main_mask(selected_clinics, start_date, end_date)
         
         # Создаем словарь для переименования клиник
         clinic_names = {
@@ -284,268 +414,84 @@ def update_trend(selected_clinics, start_date, end_date):
             'deFactum_Kids': 'deFactum Kids'
         }
         
-        # Копируем датафрейм и заменяем названия клиник
-        df_filtered = df_filtered.copy()
-        df_filtered['Name_of_clinic'] = df_filtered['Name_of_clinic'].map(clinic_names)
-        
-        fig = px.line(
-            df_filtered, 
-            x="Date", 
-            y="Count_of_chekups", 
-            color="Name_of_clinic",
-            title="Тренд количества чек-апов по клиникам",
-            labels={
-                "Date": "",
-                "Count_of_chekups": "Количество чек-апов",
-                "Name_of_clinic": ""
-            }
-        )
-        
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            title={
-                'text': "Тренд количества чек-апов по клиникам",
-                'x': 0.5,
-                'y': 0.95,
-                'xanchor': 'center',
-                'yanchor': 'top',
-                'font': dict(size=16, family='Arial', color='#1f2937')
-            },
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(size=12, family='Arial'),
-                bgcolor='rgba(255, 255, 255, 0.8)',
-                bordercolor='rgba(0, 0, 0, 0.1)',
-                borderwidth=1,
-                itemwidth=80,
-                itemsizing='constant'
-            ),
-            margin=dict(t=80, r=20, b=20, l=20),
-            xaxis=dict(
-                title=dict(text="", font=dict(size=12, family='Arial')),
-                tickfont=dict(size=10, family='Arial'),
-                tickformat='%b %d'  # Формат даты: месяц день (без года)
-            ),
-            yaxis=dict(
-                title=dict(text="Количество чек-апов", font=dict(size=12, family='Arial')),
-                tickfont=dict(size=10, family='Arial')
-            )
-        )
-        
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            title={
-                'text': "Тренд количества чек-апов по клиникам",
-                'x': 0.5,
-                'y': 0.95,
-                'xanchor': 'center',
-                'yanchor': 'top',
-                'font': dict(size=16, family='Arial', color='#1f2937')
-            },
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(size=12, family='Arial'),
-                bgcolor='rgba(255, 255, 255, 0.8)',
-                bordercolor='rgba(0, 0, 0, 0.1)',
-                borderwidth=1,
-                itemwidth=80,
-                itemsizing='constant'
-            ),
-            margin=dict(t=80, r=20, b=20, l=20),
-            xaxis=dict(
-                title=dict(text="", font=dict(size=12, family='Arial')),
-                tickfont=dict(size=10, family='Arial'),
-                tickformat='%b %d'  # Формат даты: месяц день (без года)
-            ),
-            yaxis=dict(
-                title=dict(text="Количество чек-апов", font=dict(size=12, family='Arial')),
-                tickfont=dict(size=10, family='Arial')
-            )
-        )
-        
-        fig.update_xaxes(
-            showgrid=True,
-            gridwidth=1,
-            gridcolor='rgb(243, 244, 246)',
-            showline=True,
-            linewidth=1,
-            linecolor='rgb(209, 213, 219)'
-        )
-        
-        fig.update_yaxes(
-            showgrid=True,
-            gridwidth=1,
-            gridcolor='rgb(243, 244, 246)',
-            showline=True,
-            linewidth=1,
-            linecolor='rgb(209, 213, 219)'
-        )
-        
-        # Обновляем цвета линий
-        fig.update_traces(
-            line=dict(width=2),
-            selector=dict(type='scatter')
-        )
-        
-        return fig
+        # По линии на клинику с данными, в порядке клиник снимка
+        # (на этот порядок опирается живое обновление)
+        lines = []
+        for code, clinic in enumerate(snapshot.clinics):
+            rows = mask & (snapshot.clinic_codes == code)
+            if rows.any():
+                lines.append((
+                    clinic_names.get(clinic, clinic),
+                    code,
+                    iso_dates(snapshot.dates[rows]),
+                    snapshot.counts[rows].tolist()
+                ))
+        
+        return trend_figure(lines)
     except Exception as e:
         print(f"Ошибка в update_trend: {e}")
-        return go.Figure()
+        return empty_figure()
+
+# Сводная таблица для тепловой карты (неделя × день недели с итогами)
+# и среднее количество чек-апов в день
+def heatmap_table(snapshot, selected_clinics, start_date, end_date):
+    mask = snapshot.main_mask(selected_clinics, start_date, end_date)
+    if not mask.any():
+        return None, None
+
+    # Сокращённые русские названия дней (понедельник - суббота)
+    correct_order = ['Пон', 'Вт', 'Ср', 'Чт', 'Пт', 'Суб']
+
+    # Создаем сводную таблицу неделя × день недели
+    weeks, week_index = np.unique(snapshot.week_numbers[mask], return_inverse=True)
+    weekdays = snapshot.weekdays[mask]
+    counts = snapshot.counts[mask]
+    workdays = weekdays < len(correct_order)
+    grid = np.zeros((len(weeks), len(correct_order)), dtype=np.int64)
+    np.add.at(grid, (week_index[workdays], weekdays[workdays]), counts[workdays])
+    pivot_data = pd.DataFrame(grid, index=weeks, columns=correct_order)
+
+    # Добавляем суммы по строкам
+    pivot_data['Общий итог'] = pivot_data.sum(axis=1)
+
+    # Добавляем суммы по столбцам и среднее
+    total_row = pd.DataFrame(pivot_data.sum()).T
+    total_row.index = ['Общий итог']
+    
+    # Рассчитываем среднее количество чек-апов для каждого дня
+    avg_row = pd.DataFrame(pivot_data.mean()).T
+    avg_row.index = ['Среднее']
+    
+    # Объединяем все строки
+    pivot_data = pd.concat([pivot_data, avg_row, total_row])
+
+    return pivot_data, int(counts.mean())
 
 # Обновляем callback для тепловой карты (теперь таблица)
 @app.callback(
     Output('heatmap', 'figure'),
     [Input('clinic-filter', 'value'),
      Input('date-filter', 'start_date'),
-     Input('date-filter', 'end_date')]
+     Input('date-filter', 'end_date')],
+    [State('live-view', 'data')]
 )
+@skip_live_end_date
+@serve_prerendered('heatmap')
+@single_flight('heatmap')
+@admission_controlled('heatmap', busy_figure)
+@profiled('heatmap')
 def update_heatmap(selected_clinics, start_date, end_date):
     try:
-        # Фильтруем данные
-        df_filtered = df_main[
-            (df_main["Name_of_clinic"].isin(selected_clinics)) &
-            (df_main["Date"] >= pd.to_datetime(start_date)) &
-            (df_main["Date"] <= pd.to_datetime(end_date))
-        ]
+        # Берём снимок данных один раз на запрос
+        snapshot = get_snapshot()
+        pivot_data, avg_checkups = heatmap_table(snapshot, selected_clinics, start_date, end_date)
+        if pivot_data is None:
+            return empty_figure()
 
-        # Переводим английские названия дней на русский с сокращениями
-        day_translation = {
-            'Monday': 'Пон',
-            'Tuesday': 'Вт',
-            'Wednesday': 'Ср',
-            'Thursday': 'Чт',
-            'Friday': 'Пт',
-            'Saturday': 'Суб'
-        }
-        
-        # Применяем перевод дней недели
-        df_filtered['Day_of_the_week'] = df_filtered['Day_of_the_week'].map(day_translation)
-
-        # Создаем сводную таблицу для тепловой карты
-        pivot_data = df_filtered.pivot_table(
-            values='Count_of_chekups',
-            index='Number_of_the_week',
-            columns='Day_of_the_week',
-            aggfunc='sum',
-            fill_value=0
-        )
-
-        # Определяем правильный порядок дней недели
-        correct_order = ['Пон', 'Вт', 'Ср', 'Чт', 'Пт', 'Суб']
-        pivot_data = pivot_data[correct_order]
-
-        # Добавляем суммы по строкам
-        pivot_data['Общий итог'] = pivot_data.sum(axis=1)
-
-        # Добавляем суммы по столбцам и среднее
-        total_row = pd.DataFrame(pivot_data.sum()).T
-        total_row.index = ['Общий итог']
-        
-        # Рассчитываем среднее количество чек-апов для каждого дня
-        avg_row = pd.DataFrame(pivot_data.mean()).T
-        avg_row.index = ['Среднее']
-        
-        # Объединяем все строки
-        pivot_data = pd.concat([pivot_data, avg_row, total_row])
-
-        # Создаем тепловую карту с обновленным дизайном
-        fig = go.Figure()
-
-        # Добавляем основную тепловую карту
-        fig.add_trace(go.Heatmap(
-            z=pivot_data.values,
-            x=pivot_data.columns,
-            y=pivot_data.index,
-            text=pivot_data.values.astype(int),
-            texttemplate="%{text}",
-            textfont={"size": 20, "family": "Arial", "weight": "bold"},
-            colorscale=[
-                [0, 'rgb(49, 54, 149)'],     # Темно-синий для минимальных значений
-                [0.5, 'rgb(255, 255, 255)'],  # Белый для средних значений
-                [1, 'rgb(165, 0, 38)']        # Темно-красный для максимальных значений
-            ],
-            showscale=True,
-            colorbar=dict(
-                title="Количество чек-апов",
-                titleside="right",
-                titlefont=dict(size=14),
-                tickfont=dict(size=14)
-            )
-        ))
-
-        # Вычисляем среднее количество чек-апов в день
-        avg_checkups = int(df_filtered['Count_of_chekups'].mean())
-
-        # Обновляем layout с новым дизайном
-        fig.update_layout(
-            # Добавляем подзаголовок и среднее значение
-            annotations=[
-                # Заголовок
-                dict(
-                    text='Среднее кол-во чек-апов в день',
-                    xref='paper',
-                    yref='paper',
-                    x=0.5,
-                    y=1.25,  # Поднимаем заголовок еще выше
-                    showarrow=False,
-                    font=dict(size=20, family='Arial', color='#1f2937'),
-                    align='center'
-                ),
-                # Подзаголовок
-                dict(
-                    text='Горячая карта по кол-ву медицинских чек-апов<br>(позволяет узнать нагруженные дни)',
-                    xref='paper',
-                    yref='paper',
-                    x=0.5,
-                    y=1.2,  # Поднимаем подзаголовок выше
-                    showarrow=False,
-                    font=dict(size=14, family='Arial', color='#1f2937'),
-                    align='center'
-                ),
-                # Среднее значение
-                dict(
-                    text=str(avg_checkups),
-                    xref='paper',
-                    yref='paper',
-                    x=0.95,
-                    y=1.25,  # Выравниваем с заголовком
-                    showarrow=False,
-                    font=dict(size=20, family='Arial', color='black'),
-                    bgcolor='white',
-                    bordercolor='black',
-                    borderwidth=1,
-                    borderpad=5,
-                    align='center'
-                )
-            ],
-            # Общие настройки
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            margin=dict(t=200, r=100, b=20, l=70),  # Увеличиваем отступ сверху для поднятых элементов
-            height=500,
-            title=None  # Убираем старый заголовок
-        )
-
-        # Добавляем границы ячеек
-        fig.update_traces(
-            xgap=1,  # Отступ между столбцами
-            ygap=1,  # Отступ между строками
-        )
-
-        return fig
+        return heatmap_figure(pivot_data, avg_checkups)
     except Exception as e:
         print(f"Ошибка в update_heatmap: {e}")
-        return go.Figure()
+        return empty_figure()
 
 # Функция для получения цвета в зависимости от значения
 def get_color_scale(value, vmin, vmax):
@@ -570,219 +516,185 @@ def get_color_scale(value, vmin, vmax):
     # Возвращаем цвет
     return colors[color_index]
 
+# Индексы врачей для страницы рейтинга (по убыванию количества чек-апов,
+# при равенстве - по номеру строки, чтобы страницы не пересекались).
+# Полная сортировка не нужна: отбираются первые (page + 1) * page_size
+# (вместе со всеми, кто равен последнему из них), и сортируются только они.
+def rank_doctors_page(totals, page, page_size):
+    start = page * page_size
+    stop = min(len(totals), start + page_size)
+    if start >= stop:
+        return np.array([], dtype=np.intp)
+
+    keys = -totals
+    if stop < len(totals):
+        # Порог - значение stop-го врача; равные ему берём все, а не
+        # произвольную часть, которую вернул бы argpartition
+        threshold = np.partition(keys, stop - 1)[stop - 1]
+        top = np.flatnonzero(keys <= threshold)
+    else:
+        top = np.arange(len(totals))
+    top = top[np.lexsort((top, keys[top]))]
+    return top[start:stop]
+
+# Callback для переключения страниц рейтинга врачей
+@app.callback(
+    Output('doctors-page', 'data'),
+    [Input('doctors-prev', 'n_clicks'),
+     Input('doctors-next', 'n_clicks'),
+     Input('clinic-filter', 'value'),
+     Input('date-filter', 'start_date'),
+     Input('date-filter', 'end_date')],
+    [State('doctors-page', 'data')]
+)
+def update_doctors_page(prev_clicks, next_clicks, selected_clinics, start_date, end_date, page):
+    page = page or 0
+    triggered = dash.callback_context.triggered_id
+    if triggered == 'doctors-prev':
+        return max(0, page - 1)
+    if triggered == 'doctors-next':
+        return page + 1
+    # При смене фильтров возвращаемся к первой странице
+    return 0
+
 # Callback для статистики по врачам
 @app.callback(
-    Output('doctors-stats', 'figure'),
+    [Output('doctors-stats', 'figure'),
+     Output('doctors-page-info', 'children'),
+     Output('doctors-prev', 'disabled'),
+     Output('doctors-next', 'disabled')],
     [Input('clinic-filter', 'value'),
      Input('date-filter', 'start_date'),
-     Input('date-filter', 'end_date')]
+     Input('date-filter', 'end_date'),
+     Input('doctors-page', 'data')]
 )
-def update_doctors_stats(selected_clinics, start_date, end_date):
+@serve_prerendered('doctors-stats')
+@single_flight('doctors-stats')
+@admission_controlled('doctors-stats', busy_doctors_stats)
+@profiled('doctors-stats')
+def update_doctors_stats(selected_clinics, start_date, end_date, page):
     try:
-        # Загружаем данные
-        df_doctors_kids = pd.read_csv("data/Doctor_in_kids_check-ups_daily.csv")
-        
-        # Преобразуем даты в datetime для корректного сравнения
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        
-        # Создаем списки для хранения данных
-        data_frames = []
-        
-        # Обрабатываем данные по детским врачам
-        if 'deFactum_Kids' in selected_clinics:
-            # Получаем все даты в выбранном диапазоне
-            date_columns = [col for col in df_doctors_kids.columns if col not in ['Doctor', 'Sum']]
-            selected_dates = [col for col in date_columns 
-                            if start_date <= pd.to_datetime(col, format='%m/%d/%y') <= end_date]
-            
-            if selected_dates:
-                df_kids = df_doctors_kids[['Doctor'] + selected_dates].copy()
-                df_kids['Total'] = df_kids[selected_dates].sum(axis=1)
-                df_kids = df_kids[df_kids['Doctor'] != 'Total']  # Исключаем строку Total
-                df_kids['Clinic'] = 'deFactum_Kids'
-                data_frames.append(df_kids[['Doctor', 'Total', 'Clinic']])
-        
-        # Если нет данных, возвращаем пустой график
-        if not data_frames:
-            return go.Figure()
-        
-        # Объединяем данные
-        df_combined = pd.concat(data_frames, ignore_index=True)
-        
-        # Сортируем по количеству чек-апов
-        df_combined = df_combined.sort_values('Total', ascending=True)
-        
-        # Создаем график
-        fig = go.Figure()
-        
-        # Определяем цвета для клиник
+        snapshot = get_snapshot()
+
+        # Отбираем врачей выбранных клиник и дни выбранного периода
+        rows = np.flatnonzero(np.isin(snapshot.doctor_clinics, selected_clinics))
+        date_mask = snapshot.doctor_date_mask(start_date, end_date)
+        if not len(rows) or not date_mask.any():
+            return empty_figure(), "", True, True
+
+        totals = snapshot.doctor_counts[rows][:, date_mask].sum(axis=1)
+
+        # Считаем страницы и оставляем только видимую
+        page_count = -(-len(rows) // DOCTORS_PAGE_SIZE)
+        page = min(page or 0, page_count - 1)
+        ranked = rank_doctors_page(totals, page, DOCTORS_PAGE_SIZE)
+        visible = rows[ranked]
+        visible_totals = totals[ranked]
+
+        names = snapshot.doctor_names[visible]
+        clinics = snapshot.doctor_clinics[visible]
+        groups = snapshot.doctor_groups[visible]
+
+        # Определяем цвета и подписи для клиник
         colors = {
+            'deFactum': '#1f77b4',  # Синий
             'deFactum_Kids': '#ff7f0e'  # Оранжевый
         }
-        
-        # Добавляем бары для каждой клиники
+        clinic_names = {
+            'deFactum': 'deFactum',
+            'deFactum_Kids': 'deFactum Kids'
+        }
+
+        # Горизонтальные бары для каждой клиники
+        bars = []
         for clinic in selected_clinics:
-            if clinic == 'deFactum_Kids':  # Показываем только данные детской клиники
-                df_clinic = df_combined[df_combined['Clinic'] == clinic]
-                if not df_clinic.empty:
-                    # Добавляем горизонтальные бары
-                    fig.add_trace(go.Bar(
-                        y=df_clinic['Doctor'],
-                        x=df_clinic['Total'],
-                        name='deFactum Kids',
-                        orientation='h',
-                        marker_color=colors[clinic]
-                    ))
-                    
-                    # Добавляем текстовые метки в конце каждого бара
-                    fig.add_trace(go.Scatter(
-                        x=df_clinic['Total'],
-                        y=df_clinic['Doctor'],
-                        mode='text',
-                        text=df_clinic['Total'].astype(int).astype(str),
-                        textposition='outside',
-                        textfont=dict(
-                            size=12,
-                            color='black'
-                        ),
-                        showlegend=False
-                    ))
-        
-        # Обновляем layout
-        fig.update_layout(
-            barmode='group',
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1,
-                font=dict(size=12, family='Arial')
-            ),
-            height=max(600, len(df_combined['Doctor'].unique()) * 30),  # Увеличиваем высоту
-            margin=dict(l=20, r=150, t=50, b=20),  # Увеличиваем правый отступ для значений
-            xaxis=dict(
-                title="Количество чек-апов",
-                showgrid=True,
-                gridcolor='lightgray',
-                showline=True,
-                linewidth=1,
-                linecolor='black',
-                tickfont=dict(size=12, family='Arial')
-            ),
-            yaxis=dict(
-                title="",
-                showgrid=True,
-                gridcolor='lightgray',
-                showline=True,
-                linewidth=1,
-                linecolor='black',
-                tickfont=dict(size=12, family='Arial')
-            )
-        )
-        
-        return fig
+            mask = clinics == clinic
+            if mask.any():
+                bars.append((
+                    clinic_names.get(clinic, clinic),
+                    colors.get(clinic),
+                    names[mask],
+                    visible_totals[mask],
+                    groups[mask]
+                ))
+
+        # Высота зависит только от видимой страницы
+        fig = doctors_figure(bars, names, height=max(400, len(visible) * 30 + 100))
+
+        page_info = f"Страница {page + 1} из {page_count} (врачей: {len(rows)})"
+        return fig, page_info, page == 0, page >= page_count - 1
     except Exception as e:
         print(f"Ошибка в update_doctors_stats: {e}")
-        return go.Figure()
+        return empty_figure(), "", True, True
+
+# Сравнение периодов за один проход по дневным массивам.
+# Период 0 заканчивается выбранной датой, периоды 1..count-1 идут перед ним.
+# Возвращает суммы [период, клиника, день недели], маску заполненных ячеек
+# и подписи периодов.
+def compare_periods(snapshot, selected_clinics, end_date, unit='week', count=2, length=7):
+    end = to_day(end_date)
+    dates = snapshot.dates
+
+    if unit == 'month':
+        end_month = end.astype('datetime64[M]')
+        index = (end_month - dates.astype('datetime64[M]')).astype(np.int64)
+        labels = [
+            f"{pd.Timestamp(end_month - k):%m.%Y}"
+            for k in range(count)
+        ]
+    elif unit == 'days':
+        index = (end - dates).astype(np.int64) // length
+        labels = [
+            f"{pd.Timestamp(end - (k + 1) * length + 1):%d.%m}–{pd.Timestamp(end - k * length):%d.%m}"
+            for k in range(count)
+        ]
+    else:
+        # Календарные недели: неделя 0 - с понедельника по выбранную дату
+        end_week = end - (end.astype(np.int64) + 3) % 7
+        index = (end_week - (dates - snapshot.weekdays)).astype(np.int64) // 7
+        labels = [
+            f"{pd.Timestamp(end_week - 7 * k):%d.%m}–{pd.Timestamp(min(end_week - 7 * k + 6, end)):%d.%m}"
+            for k in range(count)
+        ]
+
+    clinic_count = len(snapshot.clinics)
+    mask = snapshot.main_mask(selected_clinics) & (dates <= end) & (index >= 0) & (index < count)
+    cells = ((index * clinic_count + snapshot.clinic_codes) * 7 + snapshot.weekdays)[mask]
+    size = count * clinic_count * 7
+
+    totals = np.bincount(cells, weights=snapshot.counts[mask], minlength=size)
+    present = np.bincount(cells, minlength=size) > 0
+    shape = (count, clinic_count, 7)
+    return totals.reshape(shape).astype(np.int64), present.reshape(shape), labels
 
 # Callback для сравнения периодов
 @app.callback(
     Output('period-comparison', 'figure'),
     [Input('clinic-filter', 'value'),
      Input('date-filter', 'start_date'),
-     Input('date-filter', 'end_date')]
+     Input('date-filter', 'end_date'),
+     Input('comparison-unit', 'value'),
+     Input('comparison-count', 'value'),
+     Input('comparison-length', 'value')]
 )
-def update_period_comparison(selected_clinics, start_date, end_date):
+@serve_prerendered('period-comparison')
+@single_flight('period-comparison')
+@admission_controlled('period-comparison', busy_figure)
+@profiled('period-comparison')
+def update_period_comparison(selected_clinics, start_date, end_date, unit='week', count=2, length=7):
     try:
-        # Получаем текущую дату
-        today = datetime.now().date()
-        
-        # Получаем даты для прошлой и позапрошлой недель
-        current_week_start, current_week_end = get_week_dates(today)
-        last_week_start = current_week_start - timedelta(days=7)
-        last_week_end = current_week_end - timedelta(days=7)
-        prev_week_start = last_week_start - timedelta(days=7)
-        prev_week_end = last_week_end - timedelta(days=7)
-        
-        # Фильтруем данные
-        df_filtered = df_main[df_main["Name_of_clinic"].isin(selected_clinics)]
-        
-        # Получаем данные по неделям
-        last_week_data = df_filtered[
-            (df_filtered["Date"].dt.date >= last_week_start) & 
-            (df_filtered["Date"].dt.date <= last_week_end)
-        ].groupby(["Name_of_clinic", "Day_of_the_week"])["Count_of_chekups"].sum().reset_index()
-        
-        prev_week_data = df_filtered[
-            (df_filtered["Date"].dt.date >= prev_week_start) & 
-            (df_filtered["Date"].dt.date <= prev_week_end)
-        ].groupby(["Name_of_clinic", "Day_of_the_week"])["Count_of_chekups"].sum().reset_index()
-        
-        # Добавляем метку периода
-        last_week_data['Period'] = 'Прошлая неделя'
-        prev_week_data['Period'] = 'Позапрошлая неделя'
-        
-        # Объединяем данные
-        df_comparison = pd.concat([last_week_data, prev_week_data])
-        
-        # Определяем порядок дней недели
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        
-        # Создаем график
-        fig = px.bar(
-            df_comparison,
-            x="Day_of_the_week",
-            y="Count_of_chekups",
-            color="Period",
-            barmode="group",
-            facet_row="Name_of_clinic",
-            category_orders={"Day_of_the_week": days_order},
-            title="Сравнение количества чек-апов по неделям",
-            labels={
-                "Day_of_the_week": "День недели",
-                "Count_of_chekups": "Количество чек-апов",
-                "Name_of_clinic": "Клиника"
-            }
-        )
-        
-        fig.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            title_x=0.5,
-            title_font_size=16,
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
-        fig.update_xaxes(
-            gridcolor='lightgray',
-            showline=True,
-            linewidth=1,
-            linecolor='black'
-        )
-        
-        fig.update_yaxes(
-            gridcolor='lightgray',
-            showline=True,
-            linewidth=1,
-            linecolor='black'
-        )
-        
-        return fig
+        snapshot = get_snapshot()
+
+        # Ограничиваем параметры (поля ввода могут быть пустыми)
+        count = int(min(max(count or 2, 1), MAX_COMPARISON_PERIODS))
+        length = int(max(length or 7, 1))
+
+        totals, present, labels = compare_periods(snapshot, selected_clinics, end_date, unit, count, length)
+
+        return comparison_figure(totals, present, labels, snapshot.clinics, DAY_NAMES)
     except Exception as e:
         print(f"Ошибка в update_period_comparison: {e}")
-        return go.Figure()
+        return empty_figure()
 
 # Callback для дополнительной аналитики (лучевая диаграмма)
 @app.callback(
@@ -791,89 +703,194 @@ def update_period_comparison(selected_clinics, start_date, end_date):
      Input('date-filter', 'start_date'),
      Input('date-filter', 'end_date')]
 )
+@serve_prerendered('additional-analytics')
+@single_flight('additional-analytics')
+@admission_controlled('additional-analytics', busy_figure)
+@profiled('additional-analytics')
 def update_additional_analytics(selected_clinics, start_date, end_date):
     try:
-        # Преобразуем даты
-        start_date = pd.to_datetime(start_date).strftime('%m/%d/%y')
-        end_date = pd.to_datetime(end_date).strftime('%m/%d/%y')
-        
-        # Получаем даты в выбранном диапазоне
-        date_columns = [col for col in df_doctors_adult.columns if col != 'Doctor']
-        selected_dates = [col for col in date_columns if start_date <= col <= end_date]
-        
-        # Обрабатываем данные по взрослым
-        df_adult_metrics = df_doctors_adult[['Doctor'] + selected_dates].copy()
-        df_adult_metrics['Total'] = df_adult_metrics[selected_dates].sum(axis=1)
-        df_adult_metrics['Average'] = df_adult_metrics[selected_dates].mean(axis=1)
-        df_adult_metrics['Max'] = df_adult_metrics[selected_dates].max(axis=1)
-        df_adult_metrics['Type'] = 'Adult'
-        
-        # Обрабатываем данные по детям
-        df_kids_metrics = df_doctors_kids[['Doctor'] + selected_dates].copy()
-        df_kids_metrics['Total'] = df_kids_metrics[selected_dates].sum(axis=1)
-        df_kids_metrics['Average'] = df_kids_metrics[selected_dates].mean(axis=1)
-        df_kids_metrics['Max'] = df_kids_metrics[selected_dates].max(axis=1)
-        df_kids_metrics['Type'] = 'Kids'
-        
-        # Создаем лучевую диаграмму
-        fig = go.Figure()
-        
-        # Метрики для лучевой диаграммы
-        metrics = ['Total', 'Average', 'Max']
-        
-        # Добавляем данные для взрослых
-        adult_values = df_adult_metrics[metrics].mean().values.tolist()
-        adult_values.append(adult_values[0])  # Замыкаем график
-        
-        fig.add_trace(go.Scatterpolar(
-            r=adult_values,
-            theta=metrics + [metrics[0]],
-            fill='toself',
-            name='Adult Checkups',
-            line_color='rgb(31, 119, 180)'
-        ))
-        
-        # Добавляем данные для детей
-        kids_values = df_kids_metrics[metrics].mean().values.tolist()
-        kids_values.append(kids_values[0])  # Замыкаем график
-        
-        fig.add_trace(go.Scatterpolar(
-            r=kids_values,
-            theta=metrics + [metrics[0]],
-            fill='toself',
-            name='Kids Checkups',
-            line_color='rgb(255, 127, 14)'
-        ))
-        
-        # Обновляем layout
-        fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, max(max(adult_values), max(kids_values))]
-                )
-            ),
-            title={
-                'text': 'Сравнение метрик взрослых и детских чек-апов',
-                'x': 0.5,
-                'font_size': 16
-            },
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
-        )
-        
-        return fig
+        snapshot = get_snapshot()
+        date_mask = snapshot.doctor_date_mask(start_date, end_date)
+        # В периоде нет дней из файлов врачей - показывать нечего
+        if not date_mask.any():
+            return empty_figure()
+
+        # Метрики врачей-специалистов клиники: сумма, среднее и максимум в день,
+        # усреднённые по врачам
+        def doctor_metrics(clinic):
+            rows = (snapshot.doctor_clinics == clinic) & (snapshot.doctor_groups == 'Врачи-специалисты')
+            daily = snapshot.doctor_counts[rows][:, date_mask]
+            return [
+                float(daily.sum(axis=1).mean()),
+                float(daily.mean(axis=1).mean()),
+                float(daily.max(axis=1).mean())
+            ]
+        
+        # Лучевая диаграмма: взрослые и дети
+        return radar_figure([
+            ('Adult Checkups', 'rgb(31, 119, 180)', doctor_metrics('deFactum')),
+            ('Kids Checkups', 'rgb(255, 127, 14)', doctor_metrics('deFactum_Kids'))
+        ])
     except Exception as e:
         print(f"Ошибка в update_additional_analytics: {e}")
-        return go.Figure()
+        return empty_figure()
+
+# Живое обновление: включаем/выключаем опрос версии данных
+@app.callback(
+    Output('live-interval', 'disabled'),
+    Input('live-mode', 'value')
+)
+def toggle_live_mode(live_mode):
+    return 'on' not in (live_mode or [])
+
+# Опрос версии данных. Пока данные не менялись, ответ пустой (204) и
+# ничего не пересчитывается
+@app.callback(
+    Output('live-data', 'data'),
+    Input('live-interval', 'n_intervals'),
+    State('live-data', 'data'),
+    prevent_initial_call=True
+)
+def poll_data_version(n_intervals, live_data):
+    snapshot = refresh_if_changed()
+    if snapshot.max_date is None or (live_data and live_data['fingerprint'] == snapshot.fingerprint):
+        raise PreventUpdate
+    return {
+        'fingerprint': snapshot.fingerprint,
+        'max_date': snapshot.max_date.date().isoformat(),
+        'previous_max_date': live_data['max_date'] if live_data else None
+    }
+
+# При смене фильтров панели пересчитываются целиком - забываем, до какой даты
+# их дополняло живое обновление (к этому моменту конец периода в фильтре
+# уже сдвинут до той же даты)
+@app.callback(
+    Output('live-view', 'data'),
+    [Input('clinic-filter', 'value'),
+     Input('date-filter', 'start_date'),
+     Input('date-filter', 'end_date')]
+)
+def reset_live_view(selected_clinics, start_date, end_date):
+    return None
+
+# Новые дни в данных: отправляем только изменения - новые точки тренда,
+# изменившиеся ячейки тепловой карты и значения карточек. Конец периода в
+# фильтре сдвигаем до новой даты, чтобы следующий полный пересчёт (например,
+# при смене клиник) не вернул панели к старому периоду.
+@app.callback(
+    [Output('trend-graph', 'figure', allow_duplicate=True),
+     Output('heatmap', 'figure', allow_duplicate=True),
+     Output('total-stats', 'children', allow_duplicate=True),
+     Output('date-filter', 'max_date_allowed'),
+     Output('date-filter', 'end_date'),
+     Output('live-view', 'data', allow_duplicate=True)],
+    Input('live-data', 'data'),
+    [State('clinic-filter', 'value'),
+     State('date-filter', 'start_date'),
+     State('date-filter', 'end_date'),
+     State('live-view', 'data')],
+    prevent_initial_call=True
+)
+def push_live_updates(live_data, selected_clinics, start_date, end_date, live_view):
+    new_end = to_day(live_data['max_date'])
+    previous_end = to_day(live_data['previous_max_date'] or live_data['max_date'])
+
+    # До какой даты панели показаны сейчас
+    shown_end = to_day(live_view['shown_end'] if live_view else end_date)
+
+    # Панели дополняем, только если они показаны до края данных
+    if shown_end < previous_end or new_end <= shown_end:
+        return no_update, no_update, no_update, live_data['max_date'], no_update, no_update
+
+    try:
+        # Опрос мог попасть на другой процесс: если здесь данные ещё старые,
+        # перечитываем их. Изменения считаем только по тем же данным, что
+        # видел опрос, иначе панели получат пустые изменения и новую дату.
+        snapshot = get_snapshot()
+        if snapshot.fingerprint != live_data['fingerprint']:
+            snapshot = refresh_if_changed(min_interval=0)
+        if snapshot.fingerprint != live_data['fingerprint']:
+            return no_update, no_update, no_update, live_data['max_date'], no_update, no_update
+        return (
+            trend_delta(snapshot, selected_clinics, start_date, shown_end, new_end),
+            heatmap_delta(snapshot, selected_clinics, start_date, shown_end, new_end),
+            total_stats_delta(snapshot, selected_clinics, start_date, new_end),
+            live_data['max_date'],
+            live_data['max_date'],
+            {'shown_end': str(new_end)}
+        )
+    except Exception as e:
+        print(f"Ошибка в push_live_updates: {e}")
+        return no_update, no_update, no_update, live_data['max_date'], no_update, no_update
+
+# Новые точки тренда: дописываем в конец линий клиник
+def trend_delta(snapshot, selected_clinics, start_date, shown_end, new_end):
+    shown = snapshot.main_mask(selected_clinics, start_date, shown_end)
+    added = snapshot.main_mask(selected_clinics, start_date, new_end) & ~shown
+
+    # Линии на графике - клиники с данными, в порядке клиник снимка
+    traces = [code for code in range(len(snapshot.clinics)) if (shown & (snapshot.clinic_codes == code)).any()]
+    if set(np.unique(snapshot.clinic_codes[added])) - set(traces):
+        # Появилась новая линия - отдаём график целиком
+        return update_trend(selected_clinics, start_date, str(new_end))
+
+    patch = Patch()
+    for trace_index, code in enumerate(traces):
+        rows = added & (snapshot.clinic_codes == code)
+        if rows.any():
+            patch['data'][trace_index]['x'].extend(iso_dates(snapshot.dates[rows]))
+            patch['data'][trace_index]['y'].extend(snapshot.counts[rows].tolist())
+    return patch
+
+# Изменившиеся ячейки тепловой карты
+def heatmap_delta(snapshot, selected_clinics, start_date, shown_end, new_end):
+    old_table, _ = heatmap_table(snapshot, selected_clinics, start_date, shown_end)
+    new_table, avg_checkups = heatmap_table(snapshot, selected_clinics, start_date, new_end)
+    if old_table is None:
+        return update_heatmap(selected_clinics, start_date, str(new_end))
+
+    patch = Patch()
+    if old_table.index.equals(new_table.index):
+        changed_rows, changed_columns = np.nonzero(old_table.values != new_table.values)
+        for i, j in zip(changed_rows.tolist(), changed_columns.tolist()):
+            value = new_table.values[i, j]
+            patch['data'][0]['z'][i][j] = float(value)
+            patch['data'][0]['text'][i][j] = int(value)
+    else:
+        # Появилась новая неделя - заменяем только массивы данных
+        patch['data'][0]['z'] = new_table.values.tolist()
+        patch['data'][0]['y'] = new_table.index.tolist()
+        patch['data'][0]['text'] = new_table.values.astype(int).tolist()
+    patch['layout']['annotations'][2]['text'] = str(avg_checkups)
+    return patch
+
+# Новые значения карточек общей статистики
+def total_stats_delta(snapshot, selected_clinics, start_date, new_end):
+    stats = compute_total_stats(snapshot, selected_clinics, start_date, str(new_end))
+    values = [
+        (format_number(stats['current_week']), None),
+        (format_number(stats['last_week']), None),
+        (f"{stats['change']:.2f}%", f"text-3xl font-bold {change_color(stats['change'])}"),
+        (format_number(stats['total']), None)
+    ]
+
+    patch = Patch()
+    for card_index, (text, class_name) in enumerate(values):
+        value = patch['props']['children'][card_index]['props']['children'][0]['props']['children'][1]['props']
+        value['children'] = text
+        if class_name:
+            value['className'] = class_name
+    return patch
+
+# Панели для предварительного рендеринга: функция и аргументы после фильтров
+PANELS = {
+    'total-stats': (update_total_stats, ()),
+    'trend-graph': (update_trend, ()),
+    'heatmap': (update_heatmap, ()),
+    'doctors-stats': (update_doctors_stats, (0,)),  # первая страница рейтинга
+    'period-comparison': (update_period_comparison, ('week', 2, 7)),  # значения по умолчанию
+    'additional-analytics': (update_additional_analytics, ())
+}
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -14,38 +14,131 @@ const monthTranslations = {
     'December': 'Декабрь'
 };
 
-// Функция для локализации календаря
-function localizeCalendar() {
-    // Находим все заголовки месяцев
-    const captions = document.querySelectorAll('.CalendarMonth_caption');
-    
+// Замеры только для отладки: если открыть страницу с ?calendar-debug,
+// счётчики будут в window.calendarLocalizeStats:
+//   calls, totalMs             - вызовы и время текущей локализации
+//   legacyCalls, legacyTotalMs - сколько раз и сколько времени работал бы
+//                                прежний наблюдатель за всей страницей
+//                                (body с subtree, проход по всему документу)
+const calendarDebug = new URLSearchParams(window.location.search).has('calendar-debug');
+if (calendarDebug) {
+    window.calendarLocalizeStats = { calls: 0, totalMs: 0, legacyCalls: 0, legacyTotalMs: 0 };
+}
+
+// Функция для локализации календаря (только внутри переданного контейнера)
+function localizeCalendar(root) {
+    const started = calendarDebug ? performance.now() : 0;
+
+    // Находим заголовки месяцев
+    const captions = root.querySelectorAll('.CalendarMonth_caption');
+
     captions.forEach(caption => {
         const monthYear = caption.textContent.trim().split(' ');
         const month = monthYear[0];
         const year = monthYear[1];
-        
+
         if (monthTranslations[month]) {
             caption.setAttribute('data-month', `${monthTranslations[month]} ${year}`);
         }
     });
+
+    if (calendarDebug) {
+        window.calendarLocalizeStats.calls += 1;
+        window.calendarLocalizeStats.totalMs += performance.now() - started;
+    }
 }
 
-// Запускаем локализацию при загрузке страницы
-document.addEventListener('DOMContentLoaded', function() {
-    localizeCalendar();
-    
-    // Наблюдаем за изменениями в DOM для динамической локализации
-    const observer = new MutationObserver(function(mutations) {
-        mutations.forEach(function(mutation) {
-            if (mutation.addedNodes.length) {
-                localizeCalendar();
+// Наблюдатель за открытым календарём: следит только за порталом date picker'а
+// и переводит заголовки при листании месяцев (не чаще одного раза за кадр)
+let calendarPortal = null;
+let portalObserver = null;
+let localizeScheduled = false;
+
+function isCalendarPortal(node) {
+    return node.nodeType === Node.ELEMENT_NODE && node.querySelector('.DayPicker') !== null;
+}
+
+function watchPortal(portal) {
+    unwatchPortal();
+    calendarPortal = portal;
+    localizeCalendar(portal);
+
+    portalObserver = new MutationObserver(function() {
+        if (localizeScheduled) {
+            return;
+        }
+        localizeScheduled = true;
+        requestAnimationFrame(function() {
+            localizeScheduled = false;
+            if (calendarPortal) {
+                localizeCalendar(calendarPortal);
             }
         });
     });
-    
-    // Начинаем наблюдение за изменениями в DOM
-    observer.observe(document.body, {
+    portalObserver.observe(portal, {
         childList: true,
         subtree: true
     });
-}); 
\ No newline at end of file
+}
+
+function unwatchPortal() {
+    if (portalObserver) {
+        portalObserver.disconnect();
+    }
+    portalObserver = null;
+    calendarPortal = null;
+}
+
+// Запускаем локализацию при загрузке страницы
+document.addEventListener('DOMContentLoaded', function() {
+    // С with_portal=True календарь монтируется отдельным прямым потомком body.
+    // Следим только за прямыми потомками body (без subtree), поэтому
+    // перерисовки графиков Plotly внутри приложения сюда не попадают.
+    const bodyObserver = new MutationObserver(function(mutations) {
+        mutations.forEach(function(mutation) {
+            mutation.addedNodes.forEach(function(node) {
+                if (isCalendarPortal(node)) {
+                    watchPortal(node);
+                } else if (node.nodeType === Node.ELEMENT_NODE) {
+                    // Портал может наполниться уже после вставки контейнера
+                    requestAnimationFrame(function() {
+                        if (node.isConnected && isCalendarPortal(node)) {
+                            watchPortal(node);
+                        }
+                    });
+                }
+            });
+            mutation.removedNodes.forEach(function(node) {
+                if (node === calendarPortal) {
+                    unwatchPortal();
+                }
+            });
+        });
+    });
+
+    bodyObserver.observe(document.body, {
+        childList: true
+    });
+
+    // Для сравнения в режиме отладки повторяем работу прежнего наблюдателя:
+    // на каждую мутацию с добавленными узлами где угодно на странице (в том
+    // числе при перерисовке графиков) - проход по всему документу
+    if (calendarDebug) {
+        const legacyObserver = new MutationObserver(function(mutations) {
+            mutations.forEach(function(mutation) {
+                if (mutation.addedNodes.length) {
+                    const started = performance.now();
+                    document.querySelectorAll('.CalendarMonth_caption').forEach(function(caption) {
+                        caption.textContent.trim().split(' ');
+                    });
+                    window.calendarLocalizeStats.legacyCalls += 1;
+                    window.calendarLocalizeStats.legacyTotalMs += performance.now() - started;
+                }
+            });
+        });
+        legacyObserver.observe(document.body, {
+            childList: true,
+            subtree: true
+        });
+    }
+});
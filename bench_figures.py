@@ -0,0 +1,335 @@
+# Замер времени панелей: фигуры-словари (figures.py) против прежнего
+# построения через px / go.Figure.
+#
+# Запуск:
+#     python bench_figures.py
+#     python bench_figures.py --clinics deFactum --start 2024-12-01 --end 2024-12-31 --number 50
+#
+# Для каждой панели считается время callback'а вместе с сериализацией
+# ответа (так его отдаёт Dash) в двух вариантах: текущий callback и
+# эталонная реализация ниже - прежний код панели на px / go. Заодно фигуры
+# сравниваются между собой (после проверки валидатором Plotly); при
+# расхождении скрипт выводит отличия и завершается с кодом 1.
+import argparse
+import json
+import math
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import app
+from data_store import get_snapshot
+from prerender import prerendered
+
+CLINIC_NAMES = {
+    'deFactum': 'deFactum',
+    'deFactum_Kids': 'deFactum Kids'
+}
+
+
+# Эталонные реализации: прежнее построение фигур панелей
+
+def reference_trend(snapshot, selected_clinics, start_date, end_date):
+    mask = snapshot.main_mask(selected_clinics, start_date, end_date)
+    clinic_labels = np.array([CLINIC_NAMES.get(c, c) for c in snapshot.clinics], dtype=object)
+    df_filtered = pd.DataFrame({
+        "Date": snapshot.dates[mask],
+        "Count_of_chekups": snapshot.counts[mask],
+        "Name_of_clinic": clinic_labels[snapshot.clinic_codes[mask]]
+    })
+    fig = px.line(
+        df_filtered,
+        x="Date",
+        y="Count_of_chekups",
+        color="Name_of_clinic",
+        title="Тренд количества чек-апов по клиникам",
+        labels={"Date": "", "Count_of_chekups": "Количество чек-апов", "Name_of_clinic": ""},
+        category_orders={"Name_of_clinic": list(clinic_labels)}
+    )
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        title={
+            'text': "Тренд количества чек-апов по клиникам",
+            'x': 0.5,
+            'y': 0.95,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': dict(size=16, family='Arial', color='#1f2937')
+        },
+        legend=dict(
+            orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5,
+            font=dict(size=12, family='Arial'),
+            bgcolor='rgba(255, 255, 255, 0.8)',
+            bordercolor='rgba(0, 0, 0, 0.1)',
+            borderwidth=1,
+            itemwidth=80,
+            itemsizing='constant'
+        ),
+        margin=dict(t=80, r=20, b=20, l=20),
+        xaxis=dict(
+            title=dict(text="", font=dict(size=12, family='Arial')),
+            tickfont=dict(size=10, family='Arial'),
+            tickformat='%b %d'
+        ),
+        yaxis=dict(
+            title=dict(text="Количество чек-апов", font=dict(size=12, family='Arial')),
+            tickfont=dict(size=10, family='Arial')
+        )
+    )
+    axis_style = dict(showgrid=True, gridwidth=1, gridcolor='rgb(243, 244, 246)',
+                      showline=True, linewidth=1, linecolor='rgb(209, 213, 219)')
+    fig.update_xaxes(**axis_style)
+    fig.update_yaxes(**axis_style)
+    fig.update_traces(line=dict(width=2), selector=dict(type='scatter'))
+    return fig
+
+
+def reference_heatmap(snapshot, selected_clinics, start_date, end_date):
+    pivot_data, avg_checkups = app.heatmap_table(snapshot, selected_clinics, start_date, end_date)
+    if pivot_data is None:
+        return go.Figure()
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(
+        z=pivot_data.values,
+        x=pivot_data.columns,
+        y=pivot_data.index,
+        text=pivot_data.values.astype(int),
+        texttemplate="%{text}",
+        textfont={"size": 20, "family": "Arial"},
+        colorscale=[[0, 'rgb(49, 54, 149)'], [0.5, 'rgb(255, 255, 255)'], [1, 'rgb(165, 0, 38)']],
+        showscale=True,
+        colorbar=dict(title="Количество чек-апов", titleside="right",
+                      titlefont=dict(size=14), tickfont=dict(size=14))
+    ))
+    fig.update_layout(
+        annotations=[
+            dict(text='Среднее кол-во чек-апов в день', xref='paper', yref='paper', x=0.5, y=1.25,
+                 showarrow=False, font=dict(size=20, family='Arial', color='#1f2937'), align='center'),
+            dict(text='Горячая карта по кол-ву медицинских чек-апов<br>(позволяет узнать нагруженные дни)',
+                 xref='paper', yref='paper', x=0.5, y=1.2, showarrow=False,
+                 font=dict(size=14, family='Arial', color='#1f2937'), align='center'),
+            dict(text=str(avg_checkups), xref='paper', yref='paper', x=0.95, y=1.25, showarrow=False,
+                 font=dict(size=20, family='Arial', color='black'), bgcolor='white',
+                 bordercolor='black', borderwidth=1, borderpad=5, align='center')
+        ],
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        margin=dict(t=200, r=100, b=20, l=70),
+        height=500,
+        title=None
+    )
+    fig.update_traces(xgap=1, ygap=1)
+    return fig
+
+
+def reference_doctors(snapshot, selected_clinics, start_date, end_date, page):
+    rows = np.flatnonzero(np.isin(snapshot.doctor_clinics, selected_clinics))
+    date_mask = snapshot.doctor_date_mask(start_date, end_date)
+    if not len(rows) or not date_mask.any():
+        return go.Figure()
+    totals = snapshot.doctor_counts[rows][:, date_mask].sum(axis=1)
+    page_count = -(-len(rows) // app.DOCTORS_PAGE_SIZE)
+    page = min(page or 0, page_count - 1)
+    ranked = app.rank_doctors_page(totals, page, app.DOCTORS_PAGE_SIZE)
+    visible = rows[ranked]
+    visible_totals = totals[ranked]
+    names = snapshot.doctor_names[visible]
+    clinics = snapshot.doctor_clinics[visible]
+    groups = snapshot.doctor_groups[visible]
+
+    colors = {'deFactum': '#1f77b4', 'deFactum_Kids': '#ff7f0e'}
+    fig = go.Figure()
+    for clinic in selected_clinics:
+        mask = clinics == clinic
+        if mask.any():
+            fig.add_trace(go.Bar(
+                y=names[mask],
+                x=visible_totals[mask],
+                name=CLINIC_NAMES.get(clinic, clinic),
+                orientation='h',
+                marker_color=colors.get(clinic),
+                text=visible_totals[mask],
+                textposition='outside',
+                textfont=dict(size=12, color='black'),
+                customdata=groups[mask],
+                hovertemplate='%{y}<br>%{customdata}: %{x}<extra></extra>'
+            ))
+    axis_style = dict(showgrid=True, gridcolor='lightgray', showline=True, linewidth=1,
+                      linecolor='black', tickfont=dict(size=12, family='Arial'))
+    fig.update_layout(
+        barmode='relative',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1,
+                    font=dict(size=12, family='Arial')),
+        height=max(400, len(visible) * 30 + 100),
+        margin=dict(l=20, r=150, t=50, b=20),
+        xaxis=dict(title="Количество чек-апов", **axis_style),
+        yaxis=dict(title="", categoryorder='array', categoryarray=names[::-1], **axis_style)
+    )
+    return fig
+
+
+def reference_comparison(snapshot, selected_clinics, start_date, end_date, unit='week', count=2, length=7):
+    count = int(min(max(count or 2, 1), app.MAX_COMPARISON_PERIODS))
+    length = int(max(length or 7, 1))
+    totals, present, labels = app.compare_periods(snapshot, selected_clinics, end_date, unit, count, length)
+    period_index, clinic_index, day_index = np.nonzero(present)
+    df_comparison = pd.DataFrame({
+        "Period": np.array(labels, dtype=object)[period_index],
+        "Name_of_clinic": np.array(snapshot.clinics, dtype=object)[clinic_index],
+        "Day_of_the_week": np.array(app.DAY_NAMES, dtype=object)[day_index],
+        "Count_of_chekups": totals[period_index, clinic_index, day_index]
+    })
+    fig = px.bar(
+        df_comparison,
+        x="Day_of_the_week",
+        y="Count_of_chekups",
+        color="Period",
+        barmode="group",
+        facet_row="Name_of_clinic",
+        category_orders={"Day_of_the_week": app.DAY_NAMES, "Period": labels},
+        title="Сравнение количества чек-апов по периодам",
+        labels={"Day_of_the_week": "День недели", "Count_of_chekups": "Количество чек-апов",
+                "Name_of_clinic": "Клиника", "Period": "Период"}
+    )
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        title_x=0.5,
+        title_font_size=16,
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    axis_style = dict(gridcolor='lightgray', showline=True, linewidth=1, linecolor='black')
+    fig.update_xaxes(**axis_style)
+    fig.update_yaxes(**axis_style)
+    return fig
+
+
+def reference_radar(snapshot, selected_clinics, start_date, end_date):
+    date_mask = snapshot.doctor_date_mask(start_date, end_date)
+
+    def doctor_metrics(clinic):
+        rows = (snapshot.doctor_clinics == clinic) & (snapshot.doctor_groups == 'Врачи-специалисты')
+        daily = snapshot.doctor_counts[rows][:, date_mask]
+        return [
+            float(daily.sum(axis=1).mean()),
+            float(daily.mean(axis=1).mean()),
+            float(daily.max(axis=1).mean())
+        ]
+
+    metrics = ['Total', 'Average', 'Max']
+    adult_values = doctor_metrics('deFactum')
+    adult_values.append(adult_values[0])
+    kids_values = doctor_metrics('deFactum_Kids')
+    kids_values.append(kids_values[0])
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(r=adult_values, theta=metrics + [metrics[0]], fill='toself',
+                                  name='Adult Checkups', line_color='rgb(31, 119, 180)'))
+    fig.add_trace(go.Scatterpolar(r=kids_values, theta=metrics + [metrics[0]], fill='toself',
+                                  name='Kids Checkups', line_color='rgb(255, 127, 14)'))
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, max(max(adult_values), max(kids_values))])),
+        title={'text': 'Сравнение метрик взрослых и детских чек-апов', 'x': 0.5, 'font_size': 16},
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+
+REFERENCE = {
+    'trend-graph': reference_trend,
+    'heatmap': reference_heatmap,
+    'doctors-stats': reference_doctors,
+    'period-comparison': reference_comparison,
+    'additional-analytics': reference_radar
+}
+
+
+def _figure(value):
+    return value[0] if isinstance(value, tuple) else value
+
+
+def _best(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+# Отличия двух фигур (после нормализации через go.Figure и JSON). Подписи столбцов
+# go.Bar хранит числами, словарь - строками; это одно и то же значение.
+# Пустой словарь свойств (например, title: {}) равнозначен его отсутствию.
+def _differences(old, new, path=""):
+    if isinstance(old, dict) and isinstance(new, dict):
+        result = []
+        for key in sorted(set(old) | set(new)):
+            if key not in old or key not in new:
+                if old.get(key, new.get(key)) == {}:
+                    continue
+                result.append(f"{path}/{key}: только в {'новой' if key not in old else 'прежней'} фигуре")
+            else:
+                result += _differences(old[key], new[key], f"{path}/{key}")
+        return result
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        if len(old) != len(new):
+            return [f"{path}: длина {len(old)} != {len(new)}"]
+        return [d for i, (a, b) in enumerate(zip(old, new)) for d in _differences(a, b, f"{path}[{i}]")]
+    try:
+        if math.isclose(float(old), float(new), abs_tol=1e-9) or (math.isnan(float(old)) and math.isnan(float(new))):
+            return []
+    except (TypeError, ValueError):
+        pass
+    return [] if old == new else [f"{path}: {old!r} != {new!r}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени построения фигур")
+    parser.add_argument('--clinics', default='deFactum,deFactum_Kids',
+                        help="Клиники через запятую")
+    parser.add_argument('--start', default='2024-11-01', help="Начало периода")
+    parser.add_argument('--end', default='2025-01-31', help="Конец периода")
+    parser.add_argument('--number', type=int, default=30, help="Вызовов в одном замере")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество замеров")
+    options = parser.parse_args()
+
+    # Замеряем расчёт, а не чтение готовых отчётов
+    prerendered.enabled = False
+    snapshot = get_snapshot()
+    args = ([c.strip() for c in options.clinics.split(',') if c.strip()], options.start, options.end)
+
+    failed = False
+    print(f"{'панель':24s} {'px / go, мс':>12s} {'словарь, мс':>12s} {'ускорение':>10s}")
+    for output_id, reference in REFERENCE.items():
+        func, extra_args = app.PANELS[output_id]
+
+        old = json.loads(pio.to_json(reference(snapshot, *args, *extra_args)))
+        new = json.loads(pio.to_json(go.Figure(_figure(func(*args, *extra_args)))))  # проверка валидатором
+        differences = _differences(old, new)
+
+        before = _best(lambda: pio.json.to_json_plotly(reference(snapshot, *args, *extra_args)),
+                       options.number, options.repeat)
+        after = _best(lambda: pio.json.to_json_plotly(func(*args, *extra_args)),
+                      options.number, options.repeat)
+        print(f"{output_id:24s} {before:12.2f} {after:12.2f} {before / after:9.1f}x")
+
+        if differences:
+            failed = True
+            print("  фигуры различаются:")
+            for line in differences[:20]:
+                print(f"    {line}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
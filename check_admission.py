@@ -0,0 +1,79 @@
+# Проверка очереди допуска: когда все места освобождаются разом, каждый
+# ожидающий должен получить место, а не проспать до таймаута.
+#
+# Запуск:
+#     python check_admission.py
+#     python check_admission.py --rounds 500 --capacity 6
+#
+# В каждом раунде все места занимаются, столько же запросов встаёт в
+# очередь, после чего места освобождаются подряд. При ошибке скрипт
+# выводит номер раунда и завершается с кодом 1.
+import argparse
+import sys
+import threading
+import time
+
+from admission import HIGH_PRIORITY, LOW_PRIORITY, AdmissionController
+
+
+def run_round(controller, capacity, names):
+    for _ in range(capacity):
+        controller.acquire('holder')
+
+    results = []
+    waiters = [
+        threading.Thread(target=lambda name=name: results.append(controller.acquire(name)))
+        for name in names
+    ]
+    for thread in waiters:
+        thread.start()
+    # Ждём, пока все запросы встанут в очередь
+    while True:
+        with controller._cond:
+            if len(controller._waiting) == len(names):
+                break
+        time.sleep(0.001)
+
+    started = time.monotonic()
+    for _ in range(capacity):
+        controller.release('holder')
+    for thread in waiters:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    for name, admitted in zip(names, results):
+        if admitted:
+            controller.release(name)
+    return all(results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка очереди допуска")
+    parser.add_argument('--rounds', type=int, default=200, help="Количество раундов")
+    parser.add_argument('--capacity', type=int, default=6, help="Количество мест")
+    parser.add_argument('--timeout', type=float, default=1.0, help="Время ожидания в очереди, секунд")
+    options = parser.parse_args()
+
+    capacity = options.capacity
+    controller = AdmissionController(capacity, reserved=0)
+    controller.register('holder', HIGH_PRIORITY, capacity, capacity, options.timeout)
+    # Запросы разного приоритета вперемешку, чтобы очередь сортировалась
+    names = []
+    for i in range(capacity):
+        name = f'waiter-{i}'
+        controller.register(name, HIGH_PRIORITY if i % 2 else LOW_PRIORITY, 1, 1, options.timeout)
+        names.append(name)
+
+    for i in range(options.rounds):
+        admitted, elapsed = run_round(controller, capacity, names)
+        # Места свободны сразу, так что ожидание около таймаута - тоже ошибка
+        if not admitted or elapsed >= options.timeout / 2:
+            print(f"Ошибка в раунде {i + 1}: таймаутов {sum(controller.timed_out.values())}, "
+                  f"ожидание {elapsed:.2f} с")
+            sys.exit(1)
+
+    print(f"Готово: {options.rounds} раундов без таймаутов")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# Проверка страниц рейтинга врачей: вместе страницы показывают каждого
+# врача ровно один раз (в том числе при равных значениях).
+#
+# Запуск:
+#     python check_doctors_pages.py
+#     python check_doctors_pages.py --step 3
+#
+# Перебираются наборы клиник и периоды по датам из данных; при ошибке
+# скрипт выводит первый неверный случай и завершается с кодом 1.
+import argparse
+import sys
+
+import numpy as np
+
+from app import DOCTORS_PAGE_SIZE, rank_doctors_page
+from data_store import get_snapshot
+
+
+def check(totals, page_size):
+    page_count = -(-len(totals) // page_size)
+    shown = np.concatenate([rank_doctors_page(totals, page, page_size) for page in range(page_count)])
+    return np.array_equal(np.sort(shown), np.arange(len(totals)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка страниц рейтинга врачей")
+    parser.add_argument('--step', type=int, default=7, help="Шаг перебора дат, дней")
+    options = parser.parse_args()
+
+    snapshot = get_snapshot()
+    dates = snapshot.doctor_dates
+    clinic_sets = [[c] for c in snapshot.clinics] + [list(snapshot.clinics)]
+
+    cases = 0
+    for clinics in clinic_sets:
+        rows = np.flatnonzero(np.isin(snapshot.doctor_clinics, clinics))
+        for i in range(0, len(dates), options.step):
+            for j in range(i, len(dates), options.step):
+                totals = snapshot.doctor_counts[rows][:, i:j + 1].sum(axis=1)
+                cases += 1
+                if not check(totals, DOCTORS_PAGE_SIZE):
+                    print(f"Ошибка: {', '.join(clinics)}, {dates[i]} - {dates[j]}")
+                    sys.exit(1)
+
+    print(f"Готово: {cases} случаев без ошибок")
+
+
+if __name__ == '__main__':
+    main()
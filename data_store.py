@@ -0,0 +1,254 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Основная таблица по клиникам
+MAIN_TABLE_PATH = "data/Main_Table_Clinics.csv"
+
+# Файлы с ежедневной статистикой врачей: (путь, клиника, группа специалистов)
+DOCTOR_SOURCES = [
+    ("data/Doctor_in_Adult_check-ups_daily.csv", "deFactum", "Врачи-специалисты"),
+    ("data/Therapist_in_Adult_check-ups_daily.csv", "deFactum", "Терапевты"),
+    ("data/Doctor_in_kids_check-ups_daily.csv", "deFactum_Kids", "Врачи-специалисты"),
+    ("data/Pediatrician_in_kids_check-ups_daily.csv", "deFactum_Kids", "Педиатры"),
+]
+
+
+# Делаем копию массива, доступную только для чтения
+def _freeze(values, dtype=None):
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+# Неизменяемый срез данных. Все массивы только для чтения, поэтому
+# callback'и могут читать их без блокировок и копирования.
+@dataclass(frozen=True)
+class DataSnapshot:
+    version: int
+    created_at: datetime
+    fingerprint: str           # хэш содержимого: одинаков для одинаковых данных
+    clinics: tuple
+
+    # Основная таблица: одна строка = клиника × день
+    dates: np.ndarray          # datetime64[D]
+    weekdays: np.ndarray       # 0 = понедельник
+    week_numbers: np.ndarray
+    clinic_codes: np.ndarray   # индексы в clinics
+    counts: np.ndarray
+
+    # Статистика врачей: матрица врач × дата
+    doctor_names: np.ndarray
+    doctor_clinics: np.ndarray
+    doctor_groups: np.ndarray
+    doctor_dates: np.ndarray   # datetime64[D]
+    doctor_counts: np.ndarray
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.dates.min()) if len(self.dates) else None
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.dates.max()) if len(self.dates) else None
+
+    # Маска строк основной таблицы по клиникам и (необязательно) периоду
+    def main_mask(self, selected_clinics, start_date=None, end_date=None):
+        codes = [i for i, c in enumerate(self.clinics) if c in (selected_clinics or [])]
+        mask = np.isin(self.clinic_codes, codes)
+        if start_date is not None:
+            mask &= self.dates >= to_day(start_date)
+        if end_date is not None:
+            mask &= self.dates <= to_day(end_date)
+        return mask
+
+    # Маска колонок матрицы врачей по периоду
+    def doctor_date_mask(self, start_date, end_date):
+        return (self.doctor_dates >= to_day(start_date)) & (self.doctor_dates <= to_day(end_date))
+
+
+# Приводим дату из фильтра (строка / Timestamp / date) к datetime64[D]
+def to_day(value):
+    return np.datetime64(pd.to_datetime(value).date(), 'D')
+
+
+def _load_main_table(path):
+    try:
+        df = pd.read_csv(path)
+        dates = pd.to_datetime(df['Date'], format='%m/%d/%y').to_numpy(dtype='datetime64[D]')
+        codes, clinics = pd.factorize(df['Name_of_clinic'])
+        return {
+            'clinics': tuple(clinics),
+            'dates': dates,
+            # 1970-01-01 - четверг, отсюда сдвиг на 3 дня
+            'weekdays': (dates.view('int64') + 3) % 7,
+            'week_numbers': df['Number_of_the_week'].to_numpy(dtype=np.int64),
+            'clinic_codes': codes.astype(np.int64),
+            'counts': df['Count_of_chekups'].to_numpy(dtype=np.int64),
+        }
+    except Exception as e:
+        print(f"Ошибка при загрузке данных: {e}")
+        return {
+            'clinics': (),
+            'dates': np.array([], dtype='datetime64[D]'),
+            'weekdays': np.array([], dtype=np.int64),
+            'week_numbers': np.array([], dtype=np.int64),
+            'clinic_codes': np.array([], dtype=np.int64),
+            'counts': np.array([], dtype=np.int64),
+        }
+
+
+# Загрузка всех файлов по врачам в единую матрицу "врач × дата"
+def _load_doctor_tables(sources):
+    frames = []
+    clinics = []
+    groups = []
+    for path, clinic, group in sources:
+        try:
+            df = pd.read_csv(path)
+        except Exception as e:
+            print(f"Ошибка при загрузке {path}: {e}")
+            continue
+        # Первая колонка содержит имя врача (Doctor / Pediatrician)
+        df = df.rename(columns={df.columns[0]: 'Doctor'})
+        df['Doctor'] = df['Doctor'].astype(str).str.strip()
+        df = df[df['Doctor'] != 'Total'].drop(columns=['Sum'], errors='ignore')
+        df = df.set_index('Doctor')
+        df.columns = pd.to_datetime(df.columns, format='%m/%d/%y')
+        frames.append(df.apply(pd.to_numeric, errors='coerce'))
+        clinics += [clinic] * len(df)
+        groups += [group] * len(df)
+
+    if not frames:
+        return {
+            'names': np.array([], dtype=object),
+            'clinics': np.array([], dtype=object),
+            'groups': np.array([], dtype=object),
+            'dates': np.array([], dtype='datetime64[D]'),
+            'counts': np.zeros((0, 0), dtype=np.int64),
+        }
+
+    # Объединяем по датам (недостающие дни считаем нулями)
+    df_all = pd.concat(frames, axis=0, join='outer').fillna(0)
+    df_all = df_all[sorted(df_all.columns)]
+
+    # Одинаковые имена различаем по клинике и группе специалистов,
+    # а если и они совпали - по номеру повтора
+    labels, seen = [], set()
+    for name, clinic, group in zip(df_all.index, clinics, groups):
+        label = name if name not in seen else f"{name} ({clinic}, {group})"
+        repeat = 2
+        while label in seen:
+            label = f"{name} ({clinic}, {group}, {repeat})"
+            repeat += 1
+        seen.add(label)
+        labels.append(label)
+
+    return {
+        'names': np.array(labels, dtype=object),
+        'clinics': np.array(clinics, dtype=object),
+        'groups': np.array(groups, dtype=object),
+        'dates': df_all.columns.to_numpy(dtype='datetime64[D]'),
+        'counts': df_all.to_numpy(dtype=np.int64),
+    }
+
+
+# Хэш содержимого данных (в отличие от version, не зависит от процесса)
+def _fingerprint(main, doctors):
+    digest = hashlib.sha1()
+    digest.update("\n".join(main['clinics']).encode())
+    for key in ('dates', 'clinic_codes', 'week_numbers', 'counts'):
+        digest.update(np.ascontiguousarray(main[key]).tobytes())
+    digest.update("\n".join(doctors['names']).encode())
+    digest.update("\n".join(doctors['clinics']).encode())
+    for key in ('dates', 'counts'):
+        digest.update(np.ascontiguousarray(doctors[key]).tobytes())
+    return digest.hexdigest()
+
+
+# Читаем все файлы и собираем новый снимок данных
+def load_snapshot(version):
+    main = _load_main_table(MAIN_TABLE_PATH)
+    doctors = _load_doctor_tables(DOCTOR_SOURCES)
+    return DataSnapshot(
+        version=version,
+        created_at=datetime.now(),
+        fingerprint=_fingerprint(main, doctors),
+        clinics=main['clinics'],
+        dates=_freeze(main['dates'], 'datetime64[D]'),
+        weekdays=_freeze(main['weekdays'], np.int64),
+        week_numbers=_freeze(main['week_numbers'], np.int64),
+        clinic_codes=_freeze(main['clinic_codes'], np.int64),
+        counts=_freeze(main['counts'], np.int64),
+        doctor_names=_freeze(doctors['names'], object),
+        doctor_clinics=_freeze(doctors['clinics'], object),
+        doctor_groups=_freeze(doctors['groups'], object),
+        doctor_dates=_freeze(doctors['dates'], 'datetime64[D]'),
+        doctor_counts=_freeze(doctors['counts'], np.int64),
+    )
+
+
+# Текущий снимок. Читатели берут ссылку один раз на запрос; писатели
+# публикуют новый снимок заменой ссылки, поэтому чтение не блокируется.
+_snapshot = load_snapshot(version=1)
+_publish_lock = threading.Lock()
+
+
+def get_snapshot():
+    return _snapshot
+
+
+def publish_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+
+# Время изменения исходных файлов
+def _source_mtimes():
+    mtimes = {}
+    for path in [MAIN_TABLE_PATH] + [source[0] for source in DOCTOR_SOURCES]:
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+_loaded_mtimes = _source_mtimes()
+_checked_at = time.monotonic()
+_refresh_lock = threading.Lock()
+
+
+# Перечитываем данные с диска и публикуем их как следующую версию
+def reload_snapshot():
+    global _loaded_mtimes
+    with _publish_lock:
+        mtimes = _source_mtimes()
+        snapshot = load_snapshot(version=_snapshot.version + 1)
+        publish_snapshot(snapshot)
+        _loaded_mtimes = mtimes
+        return snapshot
+
+
+# Дешёвая проверка для опроса: не чаще раза в min_interval секунд сравниваем
+# время изменения файлов и перечитываем данные, только если они изменились
+def refresh_if_changed(min_interval=5.0):
+    global _checked_at
+    if time.monotonic() - _checked_at < min_interval:
+        return _snapshot
+    # Проверку уже выполняет другой поток - отдаём текущий снимок
+    if not _refresh_lock.acquire(blocking=False):
+        return _snapshot
+    try:
+        _checked_at = time.monotonic()
+        if _source_mtimes() != _loaded_mtimes:
+            return reload_snapshot()
+        return _snapshot
+    finally:
+        _refresh_lock.release()
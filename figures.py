@@ -0,0 +1,408 @@
+# Сборка фигур Plotly в виде обычных словарей.
+#
+# go.Figure и px проверяют каждое свойство при создании фигуры и ещё раз
+# при сериализации ответа - на горячем пути это большая часть времени
+# callback'а. Здесь фигуры собираются сразу в том виде, который выдаёт
+# Figure.to_plotly_json(): постоянные части layout и шаблон оформления
+# собраны один раз при импорте, на каждый запрос добавляются только данные.
+#
+# Постоянные словари общие для всех ответов - их нельзя изменять.
+# bench_figures.py сравнивает эти фигуры и время их построения с прежней
+# реализацией на px / go.Figure.
+import numpy as np
+import plotly.io as pio
+
+# Шаблон оформления по умолчанию (тот же, что подставляет go.Figure)
+TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+# Цвета, которые px назначает группам по порядку
+COLORWAY = TEMPLATE['layout']['colorway']
+
+
+def figure(data, layout):
+    return {'data': data, 'layout': {**layout, 'template': TEMPLATE}}
+
+
+def empty_figure():
+    return figure([], {})
+
+
+# Фигура с одной надписью по центру и без осей
+def message_figure(text):
+    return figure([], {
+        'annotations': [{
+            'font': {'color': '#6b7280', 'family': 'Arial', 'size': 14},
+            'showarrow': False,
+            'text': text,
+            'x': 0.5,
+            'xref': 'paper',
+            'y': 0.5,
+            'yref': 'paper'
+        }],
+        'xaxis': {'visible': False},
+        'yaxis': {'visible': False}
+    })
+
+
+# Даты datetime64[D] в том виде, в каком их сериализует Plotly
+def iso_dates(dates):
+    return np.datetime_as_string(dates.astype('datetime64[s]')).tolist()
+
+
+# Тренд количества чек-апов
+
+_TREND_HOVER = "=%{x}<br>Количество чек-апов=%{y}<extra></extra>"
+
+_TREND_AXIS = {
+    'domain': [0.0, 1.0],
+    'gridcolor': 'rgb(243, 244, 246)',
+    'gridwidth': 1,
+    'linecolor': 'rgb(209, 213, 219)',
+    'linewidth': 1,
+    'showgrid': True,
+    'showline': True,
+    'tickfont': {'family': 'Arial', 'size': 10}
+}
+
+_TREND_LAYOUT = {
+    'legend': {
+        'bgcolor': 'rgba(255, 255, 255, 0.8)',
+        'bordercolor': 'rgba(0, 0, 0, 0.1)',
+        'borderwidth': 1,
+        'font': {'family': 'Arial', 'size': 12},
+        'itemsizing': 'constant',
+        'itemwidth': 80,
+        'orientation': 'h',
+        'title': {'text': ''},
+        'tracegroupgap': 0,
+        'x': 0.5,
+        'xanchor': 'center',
+        'y': 1.02,
+        'yanchor': 'bottom'
+    },
+    'margin': {'b': 20, 'l': 20, 'r': 20, 't': 80},
+    'paper_bgcolor': 'rgba(0,0,0,0)',
+    'plot_bgcolor': 'rgba(0,0,0,0)',
+    'title': {
+        'font': {'color': '#1f2937', 'family': 'Arial', 'size': 16},
+        'text': 'Тренд количества чек-апов по клиникам',
+        'x': 0.5,
+        'xanchor': 'center',
+        'y': 0.95,
+        'yanchor': 'top'
+    },
+    'xaxis': {
+        **_TREND_AXIS,
+        'anchor': 'y',
+        'tickformat': '%b %d',  # Формат даты: месяц день (без года)
+        'title': {'font': {'family': 'Arial', 'size': 12}, 'text': ''}
+    },
+    'yaxis': {
+        **_TREND_AXIS,
+        'anchor': 'x',
+        'title': {'font': {'family': 'Arial', 'size': 12}, 'text': 'Количество чек-апов'}
+    }
+}
+
+
+# lines: список (название, номер клиники, даты ISO, значения) - по линии на
+# клинику. Цвет задаёт номер клиники в снимке (как category_orders в px),
+# поэтому у клиники один и тот же цвет при любом наборе линий.
+def trend_figure(lines):
+    data = [
+        {
+            'hovertemplate': _TREND_HOVER,
+            'legendgroup': name,
+            'line': {'color': COLORWAY[code % len(COLORWAY)], 'dash': 'solid', 'width': 2},
+            'marker': {'symbol': 'circle'},
+            'mode': 'lines',
+            'name': name,
+            'orientation': 'v',
+            'showlegend': True,
+            'x': x,
+            'xaxis': 'x',
+            'y': y,
+            'yaxis': 'y',
+            'type': 'scatter'
+        }
+        for name, code, x, y in lines
+    ]
+    return figure(data, _TREND_LAYOUT)
+
+
+# Тепловая карта (таблица неделя × день недели)
+
+_HEATMAP_TRACE = {
+    'colorbar': {
+        'tickfont': {'size': 14},
+        'title': {'font': {'size': 14}, 'side': 'right', 'text': 'Количество чек-апов'}
+    },
+    'colorscale': [
+        [0, 'rgb(49, 54, 149)'],     # Темно-синий для минимальных значений
+        [0.5, 'rgb(255, 255, 255)'],  # Белый для средних значений
+        [1, 'rgb(165, 0, 38)']        # Темно-красный для максимальных значений
+    ],
+    'showscale': True,
+    'textfont': {'family': 'Arial', 'size': 20},
+    'texttemplate': '%{text}',
+    'xgap': 1,  # Отступ между столбцами
+    'ygap': 1,  # Отступ между строками
+    'type': 'heatmap'
+}
+
+_HEATMAP_ANNOTATIONS = [
+    # Заголовок
+    {
+        'align': 'center',
+        'font': {'color': '#1f2937', 'family': 'Arial', 'size': 20},
+        'showarrow': False,
+        'text': 'Среднее кол-во чек-апов в день',
+        'x': 0.5,
+        'xref': 'paper',
+        'y': 1.25,
+        'yref': 'paper'
+    },
+    # Подзаголовок
+    {
+        'align': 'center',
+        'font': {'color': '#1f2937', 'family': 'Arial', 'size': 14},
+        'showarrow': False,
+        'text': 'Горячая карта по кол-ву медицинских чек-апов<br>(позволяет узнать нагруженные дни)',
+        'x': 0.5,
+        'xref': 'paper',
+        'y': 1.2,
+        'yref': 'paper'
+    }
+]
+
+# Среднее значение (третья надпись - её меняет живое обновление)
+_HEATMAP_AVERAGE = {
+    'align': 'center',
+    'bgcolor': 'white',
+    'bordercolor': 'black',
+    'borderpad': 5,
+    'borderwidth': 1,
+    'font': {'color': 'black', 'family': 'Arial', 'size': 20},
+    'showarrow': False,
+    'x': 0.95,
+    'xref': 'paper',
+    'y': 1.25,
+    'yref': 'paper'
+}
+
+_HEATMAP_LAYOUT = {
+    'height': 500,
+    'margin': {'b': 20, 'l': 70, 'r': 100, 't': 200},
+    'paper_bgcolor': 'white',
+    'plot_bgcolor': 'white'
+}
+
+
+def heatmap_figure(pivot_data, avg_checkups):
+    values = pivot_data.values
+    trace = {
+        **_HEATMAP_TRACE,
+        'text': values.astype(int).tolist(),
+        'x': pivot_data.columns.tolist(),
+        'y': pivot_data.index.tolist(),
+        'z': values.astype(float).tolist()
+    }
+    annotations = _HEATMAP_ANNOTATIONS + [{**_HEATMAP_AVERAGE, 'text': str(avg_checkups)}]
+    return figure([trace], {**_HEATMAP_LAYOUT, 'annotations': annotations})
+
+
+# Рейтинг врачей (горизонтальные столбцы)
+
+_DOCTORS_AXIS = {
+    'gridcolor': 'lightgray',
+    'linecolor': 'black',
+    'linewidth': 1,
+    'showgrid': True,
+    'showline': True,
+    'tickfont': {'family': 'Arial', 'size': 12}
+}
+
+_DOCTORS_LAYOUT = {
+    'barmode': 'relative',
+    'legend': {
+        'font': {'family': 'Arial', 'size': 12},
+        'orientation': 'h',
+        'x': 1,
+        'xanchor': 'right',
+        'y': 1.02,
+        'yanchor': 'bottom'
+    },
+    'margin': {'b': 20, 'l': 20, 'r': 150, 't': 50},  # Правый отступ для значений
+    'paper_bgcolor': 'white',
+    'plot_bgcolor': 'white',
+    'showlegend': True,
+    'xaxis': {**_DOCTORS_AXIS, 'title': {'text': 'Количество чек-апов'}}
+}
+
+
+# bars: список (название, цвет, врачи, значения, группы) - по серии на клинику;
+# names - все врачи страницы, лидер рейтинга первым
+def doctors_figure(bars, names, height):
+    data = [
+        {
+            'customdata': groups.tolist(),
+            'hovertemplate': '%{y}<br>%{customdata}: %{x}<extra></extra>',
+            'marker': {'color': color},
+            'name': name,
+            'orientation': 'h',
+            'text': values.tolist(),
+            'textfont': {'color': 'black', 'size': 12},
+            'textposition': 'outside',
+            'x': values.tolist(),
+            'y': doctors.tolist(),
+            'type': 'bar'
+        }
+        for name, color, doctors, values, groups in bars
+    ]
+    yaxis = {
+        **_DOCTORS_AXIS,
+        # Лидер рейтинга сверху
+        'categoryarray': names[::-1].tolist(),
+        'categoryorder': 'array',
+        'title': {'text': ''}
+    }
+    return figure(data, {**_DOCTORS_LAYOUT, 'height': height, 'yaxis': yaxis})
+
+
+# Сравнение периодов (столбцы по дням недели, строка графиков на клинику)
+
+# Расстояние между строками графиков и место справа под подписи клиник
+_FACET_SPACING = 0.03
+_FACET_LABEL_X = 0.98
+
+_COMPARISON_HOVER = "Период={}<br>Клиника={}<br>День недели=%{{x}}<br>Количество чек-апов=%{{y}}<extra></extra>"
+
+_COMPARISON_AXIS = {
+    'gridcolor': 'lightgray',
+    'linecolor': 'black',
+    'linewidth': 1,
+    'showline': True
+}
+
+_COMPARISON_LAYOUT = {
+    'barmode': 'group',
+    'paper_bgcolor': 'white',
+    'plot_bgcolor': 'white',
+    'showlegend': True,
+    'title': {'font': {'size': 16}, 'text': 'Сравнение количества чек-апов по периодам', 'x': 0.5}
+}
+
+_COMPARISON_LEGEND = {
+    'orientation': 'h',
+    'tracegroupgap': 0,
+    'x': 1,
+    'xanchor': 'right',
+    'y': 1.02,
+    'yanchor': 'bottom'
+}
+
+
+def _axis_name(axis, k):
+    return axis if k == 1 else f"{axis}{k}"
+
+
+# totals/present - суммы и маска заполненных ячеек [период, клиника, день недели]
+def comparison_figure(totals, present, labels, clinics, day_names):
+    # Строки графиков - клиники с данными в порядке появления (как в px);
+    # первая клиника сверху, у нижней строки оси x/y
+    filled = present.any(axis=2)
+    periods, facet_clinics = np.nonzero(filled)
+    facets = list(dict.fromkeys(facet_clinics.tolist()))
+    axis_number = {c: len(facets) - row for row, c in enumerate(facets)}
+
+    data = []
+    for color_index, period in enumerate(dict.fromkeys(periods.tolist())):
+        label = labels[period]
+        for row, clinic in enumerate(c for c in facets if filled[period, c]):
+            days = np.flatnonzero(present[period, clinic])
+            k = axis_number[clinic]
+            data.append({
+                'alignmentgroup': 'True',
+                'hovertemplate': _COMPARISON_HOVER.format(label, clinics[clinic]),
+                'legendgroup': label,
+                'marker': {'color': COLORWAY[color_index % len(COLORWAY)], 'pattern': {'shape': ''}},
+                'name': label,
+                'offsetgroup': label,
+                'orientation': 'v',
+                'showlegend': row == 0,
+                'textposition': 'auto',
+                'x': [day_names[d] for d in days],
+                'xaxis': _axis_name('x', k),
+                'y': totals[period, clinic, days].tolist(),
+                'yaxis': _axis_name('y', k),
+                'type': 'bar'
+            })
+
+    layout = {
+        **_COMPARISON_LAYOUT,
+        'legend': {**_COMPARISON_LEGEND, 'title': {'text': 'Период'}} if facets else _COMPARISON_LEGEND
+    }
+    x_domain = [0.0, _FACET_LABEL_X] if facets else [0.0, 1.0]
+    rows = max(len(facets), 1)
+    row_height = (1 - _FACET_SPACING * (rows - 1)) / rows
+    annotations = []
+    for k in range(1, rows + 1):
+        start = (k - 1) * (row_height + _FACET_SPACING)
+        y_domain = [start, 1.0 if k == rows else start + row_height]
+        xaxis = {**_COMPARISON_AXIS, 'anchor': _axis_name('y', k), 'domain': x_domain}
+        yaxis = {**_COMPARISON_AXIS, 'anchor': _axis_name('x', k), 'domain': y_domain,
+                 'title': {'text': 'Количество чек-апов'}}
+        if k == 1:
+            xaxis.update(categoryarray=list(day_names), categoryorder='array', title={'text': 'День недели'})
+        else:
+            xaxis.update(matches='x', showticklabels=False)
+            yaxis['matches'] = 'y'
+        layout[_axis_name('xaxis', k)] = xaxis
+        layout[_axis_name('yaxis', k)] = yaxis
+        if facets:
+            annotations.append({
+                'showarrow': False,
+                'text': f"Клиника={clinics[facets[len(facets) - k]]}",
+                'textangle': 90,
+                'x': _FACET_LABEL_X,
+                'xanchor': 'left',
+                'xref': 'paper',
+                'y': (y_domain[0] + y_domain[1]) / 2,
+                'yanchor': 'middle',
+                'yref': 'paper'
+            })
+    if annotations:
+        layout['annotations'] = annotations
+    return figure(data, layout)
+
+
+# Лучевая диаграмма метрик врачей
+
+_RADAR_THETA = ['Total', 'Average', 'Max', 'Total']
+
+_RADAR_LAYOUT = {
+    'legend': {'orientation': 'h', 'x': 1, 'xanchor': 'right', 'y': 1.02, 'yanchor': 'bottom'},
+    'paper_bgcolor': 'rgba(0,0,0,0)',
+    'plot_bgcolor': 'rgba(0,0,0,0)',
+    'showlegend': True,
+    'title': {'font': {'size': 16}, 'text': 'Сравнение метрик взрослых и детских чек-апов', 'x': 0.5}
+}
+
+
+# series: список (название, цвет линии, значения Total/Average/Max);
+# контур замыкается повтором первой точки
+def radar_figure(series):
+    data = [
+        {
+            'fill': 'toself',
+            'line': {'color': color},
+            'name': name,
+            'r': values + values[:1],
+            'theta': _RADAR_THETA,
+            'type': 'scatterpolar'
+        }
+        for name, color, values in series
+    ]
+    radius = max(max(values) for _, _, values in series)
+    polar = {'radialaxis': {'range': [0, radius], 'visible': True}}
+    return figure(data, {**_RADAR_LAYOUT, 'polar': polar})
@@ -0,0 +1,262 @@
+# Предварительный рендеринг стандартных отчётных периодов.
+#
+# Запуск:
+#     python prerender.py --workers 4
+#     python prerender.py --clinic-set deFactum --clinic-set deFactum,deFactum_Kids --period last_week
+#
+# Для каждой пары "набор клиник × период" рендерятся все шесть панелей:
+# JSON фигур (его отдаёт дашборд при совпадении фильтров) и статичная
+# HTML-страница.
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import threading
+from datetime import timedelta
+from functools import wraps
+
+import plotly.io as pio
+
+from data_store import get_snapshot
+
+# Каталог с готовыми результатами
+PRERENDER_DIR = os.environ.get("PRERENDER_DIR", "prerendered")
+MANIFEST_NAME = "manifest.json"
+
+STANDARD_PERIODS = ['last_week', 'last_4_weeks', 'month_to_date', 'quarter_to_date']
+
+PERIOD_TITLES = {
+    'last_week': 'Прошлая неделя',
+    'last_4_weeks': 'Последние 4 недели',
+    'month_to_date': 'С начала месяца',
+    'quarter_to_date': 'С начала квартала',
+}
+
+
+# Границы стандартного периода. Отсчёт ведём от последней даты в данных,
+# а не от текущей даты: данные могут отставать от календаря.
+def period_bounds(period, snapshot):
+    anchor = snapshot.max_date.date()
+    first = snapshot.min_date.date()
+
+    if period == 'last_week':
+        start = anchor - timedelta(days=anchor.weekday() + 7)
+        end = start + timedelta(days=6)
+    elif period == 'last_4_weeks':
+        start, end = anchor - timedelta(days=27), anchor
+    elif period == 'month_to_date':
+        start, end = anchor.replace(day=1), anchor
+    elif period == 'quarter_to_date':
+        start, end = anchor.replace(month=(anchor.month - 1) // 3 * 3 + 1, day=1), anchor
+    else:
+        raise ValueError(f"Неизвестный период: {period}")
+
+    # Раньше первой даты фильтр выбрать не позволит
+    return max(start, first), end
+
+
+def _entry_key(clinics, start_date, end_date):
+    return (
+        frozenset(clinics or []),
+        str(start_date)[:10],
+        str(end_date)[:10],
+    )
+
+
+# Готовые результаты, которые дашборд отдаёт вместо расчёта
+class PrerenderStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._fingerprint = None
+        self._index = {}
+        self._outputs = {}
+
+    # Перечитываем manifest, если его обновил batch-запуск
+    def _refresh(self):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._index = {}
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                print(f"Ошибка при чтении {path}: {e}")
+                return
+            self._fingerprint = manifest['fingerprint']
+            self._index = {
+                _entry_key(e['clinics'], e['start_date'], e['end_date']): e['json']
+                for e in manifest['entries']
+            }
+            self._outputs = {}
+            self._manifest_mtime = mtime
+
+    def lookup(self, output_id, clinics, start_date, end_date, extra_args=()):
+        if not self.enabled:
+            return None
+        self._refresh()
+        # Результаты подходят только к тем данным, по которым их строили
+        if not self._index or self._fingerprint != get_snapshot().fingerprint:
+            return None
+        name = self._index.get(_entry_key(clinics, start_date, end_date))
+        if name is None:
+            return None
+
+        outputs = self._outputs.get(name)
+        if outputs is None:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    outputs = json.load(f)
+            except Exception as e:
+                print(f"Ошибка при чтении {name}: {e}")
+                return None
+            self._outputs[name] = outputs
+
+        entry = outputs.get(output_id)
+        if entry is None or entry['extra_args'] != list(extra_args):
+            return None
+        return entry['value']
+
+
+prerendered = PrerenderStore(PRERENDER_DIR)
+
+
+# Декоратор для callback'а: если фильтры совпали с готовым отчётом,
+# отдаём его без расчёта
+def serve_prerendered(output_id):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(selected_clinics, start_date, end_date, *extra_args):
+            value = prerendered.lookup(output_id, selected_clinics, start_date, end_date, extra_args)
+            if value is not None:
+                return value
+            return func(selected_clinics, start_date, end_date, *extra_args)
+        return wrapper
+    return decorator
+
+
+# Простой рендер дерева dash-компонентов в HTML (для карточек статистики)
+def _component_html(component):
+    if component is None:
+        return ""
+    if isinstance(component, (list, tuple)):
+        return "".join(_component_html(c) for c in component)
+    if not hasattr(component, 'to_plotly_json'):
+        return html.escape(str(component))
+    tag = type(component).__name__.lower()
+    class_name = getattr(component, 'className', None)
+    attrs = f' class="{html.escape(class_name)}"' if class_name else ""
+    return f"<{tag}{attrs}>{_component_html(getattr(component, 'children', None))}</{tag}>"
+
+
+def _static_page(title, outputs):
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">",
+        f"<title>{html.escape(title)}</title>",
+        "<link rel=\"stylesheet\" href=\"https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css\">",
+        "</head><body class=\"bg-gray-50\">",
+        f"<h1 class=\"text-3xl font-bold text-center my-6\">{html.escape(title)}</h1>",
+        f"<div class=\"m-5\">{_component_html(outputs['total-stats'])}</div>",
+    ]
+    include_plotlyjs = 'cdn'
+    for output_id in ['trend-graph', 'heatmap', 'doctors-stats', 'period-comparison', 'additional-analytics']:
+        parts.append("<div class=\"m-5 p-6 bg-white rounded-lg shadow-lg\">")
+        parts.append(pio.to_html(outputs[output_id], full_html=False, include_plotlyjs=include_plotlyjs))
+        parts.append("</div>")
+        include_plotlyjs = False
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+# Рендер одного набора "клиники × период" (выполняется в процессе пула)
+def _render_job(job):
+    # Импортируем приложение в рабочем процессе: там регистрируются панели.
+    # Старые готовые результаты при рендеринге не используем.
+    from app import PANELS
+    from prerender import prerendered
+    prerendered.enabled = False
+
+    clinics, period, start_date, end_date, output_dir = job
+    args = (list(clinics), start_date.isoformat(), end_date.isoformat())
+
+    outputs = {}
+    payload = {}
+    for output_id, (func, extra_args) in PANELS.items():
+        value = func(*args, *extra_args)
+        outputs[output_id] = value[0] if isinstance(value, tuple) else value
+        payload[output_id] = {
+            'extra_args': list(extra_args),
+            'value': json.loads(pio.json.to_json_plotly(value)),
+        }
+
+    name = f"{'+'.join(clinics)}__{period}"
+    with open(os.path.join(output_dir, name + ".json"), "w") as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+    title = f"{', '.join(clinics)}: {PERIOD_TITLES[period]} ({start_date:%d.%m.%Y} - {end_date:%d.%m.%Y})"
+    with open(os.path.join(output_dir, name + ".html"), "w") as f:
+        f.write(_static_page(title, outputs))
+
+    return {
+        'clinics': list(clinics),
+        'period': period,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'json': name + ".json",
+        'html': name + ".html",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Предварительный рендеринг стандартных отчётов")
+    parser.add_argument('--clinic-set', action='append', dest='clinic_sets',
+                        help="Клиники через запятую; можно указать несколько раз "
+                             "(по умолчанию: каждая клиника отдельно и все вместе)")
+    parser.add_argument('--period', action='append', dest='periods', choices=STANDARD_PERIODS,
+                        help="Период; можно указать несколько раз (по умолчанию: все)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="Количество процессов")
+    parser.add_argument('--output-dir', default=PRERENDER_DIR,
+                        help="Каталог для результатов")
+    options = parser.parse_args()
+
+    snapshot = get_snapshot()
+    if snapshot.max_date is None:
+        parser.error("Нет данных для рендеринга")
+
+    if options.clinic_sets:
+        clinic_sets = [tuple(c.strip() for c in s.split(',') if c.strip()) for s in options.clinic_sets]
+    else:
+        clinic_sets = [(c,) for c in snapshot.clinics] + [tuple(snapshot.clinics)]
+    periods = options.periods or STANDARD_PERIODS
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    jobs = [
+        (clinics, period, *period_bounds(period, snapshot), options.output_dir)
+        for clinics in clinic_sets
+        for period in periods
+    ]
+
+    with multiprocessing.Pool(options.workers) as pool:
+        entries = pool.map(_render_job, jobs)
+
+    # manifest пишем последним и атомарно: дашборд видит только готовый набор
+    manifest_path = os.path.join(options.output_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({'fingerprint': snapshot.fingerprint, 'entries': entries}, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    print(f"Готово: {len(entries)} отчётов в {options.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import cProfile
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from urllib.parse import parse_qs, urlparse
+
+import flask
+
+# Настройки профилирования (читаются один раз при старте):
+#   CALLBACK_PROFILE_RATE     - доля запросов для профилирования (0..1)
+#   CALLBACK_PROFILE_TOKEN    - токен администратора: страница с ?profile=<токен>
+#                               профилируется всегда
+#   CALLBACK_PROFILE_DIR      - каталог для профилей
+#   CALLBACK_PROFILE_KEEP     - сколько последних профилей хранить
+#   CALLBACK_PROFILE_INTERVAL - шаг семплирования стеков, мс
+PROFILE_RATE = float(os.environ.get("CALLBACK_PROFILE_RATE", "0") or 0)
+PROFILE_TOKEN = os.environ.get("CALLBACK_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("CALLBACK_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("CALLBACK_PROFILE_KEEP", "200"))
+PROFILE_INTERVAL = float(os.environ.get("CALLBACK_PROFILE_INTERVAL", "5")) / 1000
+
+PROFILING_ENABLED = PROFILE_RATE > 0 or bool(PROFILE_TOKEN)
+
+# Порядковый номер профиля в процессе (чтобы имена файлов не совпадали)
+_sequence = itertools.count()
+
+
+# Семплирующий профайлер: отдельный поток периодически снимает стек
+# целевого потока и считает одинаковые стеки (формат collapsed stacks)
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# Запрос администратора: токен передан в адресе страницы (?profile=<токен>).
+# Сравниваем байты: compare_digest не принимает строки с не-ASCII символами.
+def requested_by_admin():
+    if not PROFILE_TOKEN or not flask.has_request_context():
+        return False
+    query = parse_qs(urlparse(flask.request.referrer or "").query)
+    token = query.get("profile", [""])[0]
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+# Удаляем самые старые профили, оставляя PROFILE_KEEP последних
+def _rotate(directory):
+    files = sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory)),
+        key=os.path.getmtime
+    )
+    # На каждый профиль приходится два файла: .pstats и .collapsed
+    for path in files[:max(0, len(files) - PROFILE_KEEP * 2)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _run_profiled(name, func, args):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Другой профайлер уже активен - выполняем без профилирования
+        return func(*args)
+
+    try:
+        with StackSampler(threading.get_ident(), PROFILE_INTERVAL) as sampler:
+            return func(*args)
+    finally:
+        profiler.disable()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            base = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}")
+            profiler.dump_stats(base + ".pstats")
+            with open(base + ".collapsed", "w") as f:
+                f.write(sampler.collapsed())
+            _rotate(PROFILE_DIR)
+        except Exception as e:
+            print(f"Ошибка при сохранении профиля {name}: {e}")
+
+
+# Декоратор для callback'а. Если профилирование выключено, функция
+# возвращается без обёртки и накладных расходов нет.
+# Профилируется только фактический расчёт: запрос, отклонённый контролем
+# допуска, не профилируется. Чтобы запрос администратора не присоединился
+# к чужому расчёту без профиля, single_flight учитывает requested_by_admin()
+# в ключе.
+def profiled(name):
+    def decorator(func):
+        if not PROFILING_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args):
+            if requested_by_admin() or random.random() < PROFILE_RATE:
+                return _run_profiled(name, func, args)
+            return func(*args)
+        return wrapper
+    return decorator
@@ -0,0 +1,96 @@
+import threading
+from functools import wraps
+
+from data_store import get_snapshot
+from profiling import requested_by_admin
+
+
+# Вычисление, которое выполняется прямо сейчас; остальные запросы ждут его результат
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Объединение одинаковых одновременных вычислений: пока по ключу идёт расчёт,
+# повторные запросы не запускают свой, а ждут готовый результат
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Счётчики по callback'ам: сколько раз считали и сколько запросов объединили
+        self.executions = {}
+        self.coalesced = {}
+
+    def do(self, key, func, *args):
+        name = key[0]
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions[name] = self.executions.get(name, 0) + 1
+            else:
+                self.coalesced[name] = self.coalesced.get(name, 0) + 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    # Счётчики в текстовом формате Prometheus
+    def metrics_lines(self):
+        with self._lock:
+            executions = dict(self.executions)
+            coalesced = dict(self.coalesced)
+        lines = [
+            "# HELP dash_singleflight_executions_total Callback computations actually executed",
+            "# TYPE dash_singleflight_executions_total counter",
+        ]
+        lines += [f'dash_singleflight_executions_total{{callback="{name}"}} {value}'
+                  for name, value in sorted(executions.items())]
+        lines += [
+            "# HELP dash_singleflight_coalesced_total Requests served by waiting on an in-flight computation",
+            "# TYPE dash_singleflight_coalesced_total counter",
+        ]
+        lines += [f'dash_singleflight_coalesced_total{{callback="{name}"}} {value}'
+                  for name, value in sorted(coalesced.items())]
+        return lines
+
+
+flights = SingleFlight()
+
+
+# Списки из фильтров превращаем в кортежи, чтобы аргументы можно было хэшировать
+def _freeze_args(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_args(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze_args(v)) for k, v in value.items()))
+    return value
+
+
+# Декоратор для callback'а: ключ = (имя, значения фильтров, версия данных,
+# запрошен ли профиль). Запрос администратора с ?profile=<токен> не ждёт
+# расчёт без профилирования, а выполняет свой.
+def single_flight(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = (name, _freeze_args(args), get_snapshot().version, requested_by_admin())
+            return flights.do(key, func, *args)
+        return wrapper
+    return decorator